@@ -0,0 +1,723 @@
+import gzip
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.exceptions import NewConnectionError
+from urllib3.util import make_headers
+
+# Default number of keep-alive connections kept open to the API server.
+DEFAULT_POOL_SIZE = 10
+
+# Default number of seconds to wait for a connection to the API server, and for its response, before giving up on a request.
+DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_TIMEOUT = 10
+
+# Default number of times a failed request is retried. The delay before each retry is drawn at random up to a limit
+# which doubles after each attempt, so that clients do not retry in lockstep.
+DEFAULT_MAX_RETRIES = 3
+BASE_RETRY_DELAY = 0.5
+MAX_RETRY_DELAY = 8
+
+# Responses which mean the API server is overloaded or briefly unavailable, so the request can be retried.
+RETRY_STATUSES = (429, 502, 503, 504)
+
+# Methods which can be sent again without applying the request twice.
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+# Number of consecutive requests which failed after all their retries, after which requests fail straight away, and
+# the number of seconds until a single request is let through again to check whether the API server has recovered.
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_TIMEOUT = 30
+
+# Errors raised when the API server cannot be reached at all, or the connection drops in the middle of a streamed response, as opposed to errors returned by the server.
+CONNECTION_ERRORS = (
+    requests.ConnectionError,
+    requests.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+)
+
+
+class CircuitOpen(requests.ConnectionError):
+    """
+    Raised without contacting the API server while it is considered down. It is a connection error, so the callers
+    which fall back to the local mirror while offline do so straight away.
+    """
+
+    def __init__(self, retry_in):
+        super().__init__(
+            f"The API server is not responding. Requests are paused for {retry_in:.0f} more second(s)."
+        )
+
+        self.retry_in = retry_in
+
+
+class ServerError(requests.HTTPError):
+    """
+    Raised when the API server still fails with a 5xx response after the request has been retried.
+    """
+
+
+class ClientError(requests.HTTPError):
+    """
+    Raised when the API server rejects a request with a 4xx response, so retrying it would not help.
+    """
+
+
+# Compressed encodings accepted from the API server: gzip and deflate, plus Brotli and Zstandard if the optional
+# brotli and zstandard packages are installed, which is when urllib3 can decode them.
+ACCEPT_ENCODING = make_headers(accept_encoding=True)["accept-encoding"]
+
+# Request bodies of at least this many bytes, such as bulk registrations and updates, are compressed with gzip.
+REQUEST_COMPRESSION_MIN_SIZE = 1024
+
+# Responses to a compressed request body which may mean the API server does not decode it. Many servers do not
+# decode the Content-Encoding of requests, and reject the body as invalid JSON rather than as an unsupported encoding.
+COMPRESSION_REJECTED_STATUSES = (400, 415, 422)
+
+# Response returned to a conditional request when the resource has not changed since the validators were issued.
+NOT_MODIFIED = 304
+
+
+@dataclass(slots=True)
+class CachedResource:
+    """
+    The validators of a resource returned by the API server, and its body.
+    """
+
+    etag: str | None
+    last_modified: str | None
+
+    # The raw content of the response, or the parsed form of a streamed response stored by the caller.
+    body: object
+    headers: dict
+    encoding: str | None = None
+
+
+@dataclass(slots=True)
+class TransferStats:
+    """
+    Number of bytes exchanged with an endpoint of the API server, before (raw) and after (wire) compression.
+    """
+
+    requests: int = 0
+    sent: int = 0
+    sent_wire: int = 0
+    received: int = 0
+    received_wire: int = 0
+
+    @property
+    def raw(self):
+        return self.sent + self.received
+
+    @property
+    def wire(self):
+        return self.sent_wire + self.received_wire
+
+    @property
+    def saved(self):
+        """
+        Fraction of the raw bytes which compression kept off the network.
+        """
+
+        return 1 - self.wire / self.raw if self.raw else 0.0
+
+
+class TransferMetrics:
+    """
+    Raw and wire bytes exchanged with each endpoint of the API server, to show the bandwidth saved by compression.
+    """
+
+    def __init__(self):
+        self.endpoints = {}
+        self._lock = threading.Lock()
+
+    def stats(self, endpoint):
+        return self.endpoints.setdefault(endpoint, TransferStats())
+
+    def record_request(self, endpoint, sent, sent_wire):
+        with self._lock:
+            stats = self.stats(endpoint)
+
+            stats.requests += 1
+            stats.sent += sent
+            stats.sent_wire += sent_wire
+
+    def record_response(self, endpoint, received, received_wire):
+        with self._lock:
+            stats = self.stats(endpoint)
+
+            stats.received += received
+            stats.received_wire += received_wire
+
+    def snapshot(self):
+        """
+        Get a copy of the stats of each endpoint, and of all of them together.
+        """
+
+        total = TransferStats()
+
+        with self._lock:
+            endpoints = {
+                endpoint: replace(stats) for endpoint, stats in self.endpoints.items()
+            }
+
+        for stats in endpoints.values():
+            total.requests += stats.requests
+            total.sent += stats.sent
+            total.sent_wire += stats.sent_wire
+            total.received += stats.received
+            total.received_wire += stats.received_wire
+
+        return endpoints, total
+
+
+class CircuitBreaker:
+    """
+    Tracks consecutive failures of the API server. Once there are too many, the circuit opens and requests fail
+    straight away. After a timeout, a single request is let through: if it succeeds the circuit closes, otherwise it
+    opens again.
+    """
+
+    def __init__(
+        self,
+        failure_threshold=CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout=CIRCUIT_RESET_TIMEOUT,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.failures = 0
+        self.opened_at = None
+
+        # When the request checking whether the API server has recovered was let through. A probe which never
+        # finishes stops blocking the others after the timeout.
+        self.probing_since = None
+
+        self._lock = threading.Lock()
+
+    @property
+    def open(self):
+        return self.opened_at is not None
+
+    def before_request(self):
+        """
+        Raise CircuitOpen if the request must not be sent.
+        """
+
+        with self._lock:
+            if self.opened_at is None:
+                return
+
+            now = time.monotonic()
+            retry_in = self.opened_at + self.reset_timeout - now
+
+            probing = (
+                self.probing_since is not None
+                and now - self.probing_since < self.reset_timeout
+            )
+
+            if retry_in > 0 or probing:
+                raise CircuitOpen(max(retry_in, 0))
+
+            self.probing_since = now
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing_since = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.probing_since = None
+
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+def describe_error(error):
+    """
+    Get a title and message describing an error from the API client for the user, or None if it is another error.
+    """
+
+    if isinstance(error, CircuitOpen):
+        return "API server unavailable", str(error)
+
+    if isinstance(error, ServerError):
+        return "API server error", str(error)
+
+    if isinstance(error, ClientError):
+        return "Request rejected", str(error)
+
+    if isinstance(error, requests.Timeout):
+        return (
+            "API server not responding",
+            "The API server did not respond in time. Please try again.",
+        )
+
+    if isinstance(error, CONNECTION_ERRORS):
+        return (
+            "API server unreachable",
+            "The API server could not be reached. Please check the network connection and try again.",
+        )
+
+    return None
+
+
+def was_not_sent(error):
+    """
+    Check whether a request failed before reaching the API server, so that it can be retried even if it is not idempotent.
+    """
+
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+
+    reason = getattr(error.args[0] if error.args else None, "reason", None)
+
+    return isinstance(reason, NewConnectionError)
+
+
+def retry_delay(attempt, response=None):
+    """
+    Get the number of seconds to wait before retrying, honouring the Retry-After header of the response if there is one.
+    """
+
+    delay = random.uniform(0, min(MAX_RETRY_DELAY, BASE_RETRY_DELAY * 2**attempt))
+
+    retry_after = None if response is None else response.headers.get("Retry-After")
+
+    if retry_after is not None and retry_after.isdigit():
+        delay = max(delay, min(int(retry_after), MAX_RETRY_DELAY))
+
+    return delay
+
+
+@dataclass(slots=True)
+class InFlightCall:
+    """
+    A call shared by every caller which asked for the same key while it was running.
+    """
+
+    done: threading.Event = field(default_factory=threading.Event)
+    result: object = None
+    error: BaseException | None = None
+
+
+class SingleFlight:
+    """
+    Runs a function only once for all the callers which ask for the same key at the same time. The first caller runs
+    it, and the others wait for it and get the same result, or the same error.
+    """
+
+    def __init__(self):
+        self.calls = {}
+
+        # Number of calls which were served by another caller's call instead of running the function.
+        self.shared = 0
+
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self.calls.get(key)
+            leader = call is None
+
+            if leader:
+                call = self.calls[key] = InFlightCall()
+
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+
+            if call.error is not None:
+                raise call.error
+
+            return call.result
+
+        try:
+            call.result = fn()
+
+        except BaseException as e:
+            call.error = e
+            raise
+
+        finally:
+            with self._lock:
+                del self.calls[key]
+
+            call.done.set()
+
+        return call.result
+
+
+class ConditionalCache:
+    """
+    Validators (ETag and Last-Modified) of the resources read from the API server along with their bodies, so that a
+    resource which has not changed is served from memory after a 304 Not Modified response carrying only headers.
+    """
+
+    def __init__(self):
+        self.resources = {}
+
+        # Number of conditional requests answered with 304 Not Modified, and with the full resource.
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(path, params=None):
+        return path, tuple(sorted((params or {}).items()))
+
+    def headers(self, key):
+        """
+        Get the conditional headers for the resource, if it has been cached.
+        """
+
+        with self._lock:
+            resource = self.resources.get(key)
+
+        if resource is None:
+            return {}
+
+        headers = {}
+
+        if resource.etag is not None:
+            headers["If-None-Match"] = resource.etag
+
+        if resource.last_modified is not None:
+            headers["If-Modified-Since"] = resource.last_modified
+
+        return headers
+
+    def get(self, key):
+        with self._lock:
+            return self.resources.get(key)
+
+    def store(self, key, response, body):
+        """
+        Cache the body of a response along with its validators. Responses without validators cannot be revalidated, so
+        they are not cached.
+        """
+
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+
+        if etag is None and last_modified is None:
+            return
+
+        resource = CachedResource(
+            etag, last_modified, body, dict(response.headers), response.encoding
+        )
+
+        with self._lock:
+            self.resources[key] = resource
+
+    def count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+
+            else:
+                self.misses += 1
+
+    def clear(self):
+        with self._lock:
+            self.resources.clear()
+
+
+class APIClient:
+    """
+    Client for the API server which reuses warm, pooled connections for every request.
+    """
+
+    def __init__(
+        self,
+        base_url,
+        pool_size=DEFAULT_POOL_SIZE,
+        timeout=DEFAULT_TIMEOUT,
+        connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+        max_retries=DEFAULT_MAX_RETRIES,
+        compress_requests=False,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_retries = max_retries
+
+        # A single session keeps connections to the API server alive between requests.
+        self.session = requests.Session()
+
+        # Mount an adapter with a connection pool large enough for concurrent requests.
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        # Ask for compressed responses. The long key names repeated for every participant compress very well.
+        self.session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+
+        # Whether large request bodies are compressed. It is only enabled for API servers known to decode them, and
+        # turned off again if the API server rejects a compressed body.
+        self.compress_requests = compress_requests
+
+        self.cache = ConditionalCache()
+        self.metrics = TransferMetrics()
+        self.circuit_breaker = CircuitBreaker()
+        self.single_flight = SingleFlight()
+
+    def set_api_key(self, api_key):
+        """
+        Inject the API key into the query parameters of every subsequent request.
+        """
+
+        self.session.params["api-key"] = api_key
+
+        # Resources cached for another API key may not be visible with this one.
+        self.cache.clear()
+
+    def request(self, method, path, **kwargs):
+        """
+        Make a request to the given path on the API server using the pooled session.
+        """
+
+        kwargs.setdefault("timeout", (self.connect_timeout, self.timeout))
+
+        endpoint = f"{method} {path}"
+
+        if "json" not in kwargs:
+            response = self.send(method, f"{self.base_url}{path}", **kwargs)
+            self.metrics.record_request(endpoint, 0, 0)
+
+        else:
+            response = self.send_json(
+                method, path, endpoint, kwargs.pop("json"), **kwargs
+            )
+
+        # Streamed responses are measured as they are read, with iter_content().
+        if not kwargs.get("stream"):
+            self.record_response(endpoint, response, len(response.content))
+
+        return response
+
+    def send_json(self, method, path, endpoint, data, headers=None, **kwargs):
+        """
+        Send a JSON request body, compressing it with gzip if request compression is enabled and the body is large
+        enough. If the API server rejects a compressed body, it is sent again uncompressed and later bodies are not
+        compressed.
+        """
+
+        body = json.dumps(data).encode()
+        headers = {"Content-Type": "application/json", **(headers or {})}
+        url = f"{self.base_url}{path}"
+
+        if self.compress_requests and len(body) >= REQUEST_COMPRESSION_MIN_SIZE:
+            compressed = gzip.compress(body)
+
+            response = self.send(
+                method,
+                url,
+                data=compressed,
+                headers={**headers, "Content-Encoding": "gzip"},
+                **kwargs,
+            )
+            self.metrics.record_request(endpoint, len(body), len(compressed))
+
+            if response.status_code not in COMPRESSION_REJECTED_STATUSES:
+                return response
+
+            self.compress_requests = False
+            response.close()
+
+        response = self.send(method, url, data=body, headers=headers, **kwargs)
+        self.metrics.record_request(endpoint, len(body), len(body))
+
+        return response
+
+    def send(self, method, url, **kwargs):
+        """
+        Send a request through the circuit breaker, retrying it with a random, growing delay if it fails with a
+        connection error or a response which means the API server is briefly unavailable. Requests which are not
+        idempotent are only retried if they never reached the API server.
+
+        Raises CircuitOpen straight away while the API server is considered down, and ServerError if it still responds
+        with a 5xx error after the retries.
+        """
+
+        idempotent = method in IDEMPOTENT_METHODS
+        attempt = 0
+
+        # The circuit breaker counts each request once, however many times it is retried, so a single request which
+        # runs out of retries does not open the circuit on its own. A request let through to probe a recovering API
+        # server keeps its retries.
+        self.circuit_breaker.before_request()
+
+        while True:
+            try:
+                response = self.session.request(method, url, **kwargs)
+
+            except CONNECTION_ERRORS as e:
+                if attempt >= self.max_retries or not (idempotent or was_not_sent(e)):
+                    self.circuit_breaker.record_failure()
+                    raise
+
+                time.sleep(retry_delay(attempt))
+                attempt += 1
+                continue
+
+            if (
+                response.status_code in RETRY_STATUSES
+                and idempotent
+                and attempt < self.max_retries
+            ):
+                response.close()
+
+                time.sleep(retry_delay(attempt, response))
+                attempt += 1
+                continue
+
+            if response.status_code >= 500:
+                self.circuit_breaker.record_failure()
+                response.close()
+
+                raise ServerError(
+                    f"The API server failed to handle the request: {response.status_code} {response.reason}",
+                    response=response,
+                )
+
+            self.circuit_breaker.record_success()
+
+            return response
+
+    def record_response(self, endpoint, response, received):
+        """
+        Record the size of a response body once it has been read, along with the number of bytes which crossed the
+        network, which is smaller if the API server compressed it.
+        """
+
+        self.metrics.record_response(endpoint, received, response.raw.tell())
+
+    def iter_content(self, response, chunk_size):
+        """
+        Iterate over the decompressed content of a streamed response, recording its size once it has been read.
+        """
+
+        method = response.request.method
+        path = urlsplit(response.request.url).path.removeprefix(
+            urlsplit(self.base_url).path
+        )
+        received = 0
+
+        # The size is also recorded if the caller stops reading early, such as at the end of a JSON array.
+        try:
+            for chunk in response.iter_content(chunk_size):
+                received += len(chunk)
+
+                yield chunk
+
+        finally:
+            self.record_response(f"{method} {path}", response, received)
+
+    def get(self, path, conditional=False, **kwargs):
+        """
+        Make a GET request. A conditional request sends the validators of the cached resource, if there is one, and a
+        304 Not Modified response is replaced with the cached resource.
+
+        The body of a streamed response is not cached, so the caller stores its parsed form with cache_body() and gets
+        it back with cached_body() when the response is 304 Not Modified.
+
+        Identical GET requests made at the same time share a single request to the API server and its response, except
+        for streamed responses, which can only be read once.
+        """
+
+        if kwargs.get("stream"):
+            return self.fetch(path, conditional, **kwargs)
+
+        key = (
+            path,
+            conditional,
+            tuple(sorted((kwargs.get("params") or {}).items())),
+            tuple(sorted((kwargs.get("headers") or {}).items())),
+        )
+
+        return self.single_flight.do(
+            key, lambda: self.fetch(path, conditional, **kwargs)
+        )
+
+    def fetch(self, path, conditional=False, **kwargs):
+        if not conditional:
+            return self.request("GET", path, **kwargs)
+
+        key = self.cache.key(path, kwargs.get("params"))
+        headers = {**self.cache.headers(key), **kwargs.pop("headers", {})}
+
+        response = self.request("GET", path, headers=headers, **kwargs)
+        resource = self.cache.get(key)
+
+        if response.status_code == NOT_MODIFIED and resource is not None:
+            self.cache.count(hit=True)
+
+            if kwargs.get("stream"):
+                return response
+
+            return self.cached_response(response, resource)
+
+        self.cache.count(hit=False)
+
+        if response.ok and not kwargs.get("stream"):
+            self.cache.store(key, response, response.content)
+
+        return response
+
+    @staticmethod
+    def cached_response(response, resource):
+        """
+        Build a response from a cached resource, in place of the 304 Not Modified response to revalidating it.
+        """
+
+        cached = requests.Response()
+        cached.status_code = 200
+        cached.headers = CaseInsensitiveDict({**resource.headers, **response.headers})
+        cached.encoding = resource.encoding
+        cached.url = response.url
+        cached.request = response.request
+        cached._content = resource.body
+
+        return cached
+
+    def cached_body(self, path, params=None):
+        """
+        Get the body stored for a resource, or None if it has not been cached.
+        """
+
+        resource = self.cache.get(self.cache.key(path, params))
+
+        return None if resource is None else resource.body
+
+    def cache_body(self, path, response, body, params=None):
+        """
+        Store the body of a streamed response once all of it has been received, so that it can be revalidated.
+        """
+
+        self.cache.store(self.cache.key(path, params), response, body)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def put(self, path, **kwargs):
+        return self.request("PUT", path, **kwargs)
+
+    def close(self):
+        """
+        Close all pooled connections.
+        """
+
+        self.session.close()
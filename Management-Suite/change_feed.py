@@ -0,0 +1,309 @@
+import codecs
+import json
+import socket
+import threading
+import time
+from dataclasses import dataclass
+import requests
+from api_client import CONNECTION_ERRORS
+
+# Server-sent events stream of the changes made to teams and users, and the long-poll endpoint used if it is not available.
+STREAM_PATH = "/changes/stream"
+POLL_PATH = "/changes/"
+
+# Number of seconds the API server holds a long-poll request open while there are no changes.
+POLL_TIMEOUT = 30
+
+# Number of seconds without any data, including heartbeats, after which the stream is considered dead.
+STREAM_READ_TIMEOUT = 60
+
+# Number of seconds to wait before reconnecting, doubled after each consecutive failure.
+BASE_RECONNECT_DELAY = 1
+MAX_RECONNECT_DELAY = 60
+
+# Responses which mean the API server does not provide the endpoint.
+UNSUPPORTED_STATUSES = (404, 405, 406, 501)
+
+# Response which means the API server no longer has the changes since the cursor, so the catalogue must be downloaded again.
+CURSOR_EXPIRED_STATUS = 410
+
+# Kinds of record and actions of a change.
+KIND_TEAM = "team"
+KIND_USER = "user"
+ACTION_UPSERT = "upsert"
+ACTION_DELETE = "delete"
+
+
+@dataclass(slots=True)
+class Change:
+    """
+    A team or user which was created, updated or deleted on the API server.
+    """
+
+    kind: str
+    action: str
+
+    # The details of the record, or only its ID if it was deleted.
+    data: dict
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data["kind"], data["action"], data["data"])
+
+
+@dataclass(slots=True)
+class ServerSentEvent:
+    event: str = "message"
+    data: str = ""
+    id: str | None = None
+
+
+def iter_server_sent_events(chunks):
+    """
+    Parse a text/event-stream from an iterable of byte chunks, yielding each event as soon as it has been received.
+    """
+
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    event = ServerSentEvent()
+    data = []
+
+    for chunk in chunks:
+        buffer += text_decoder.decode(chunk)
+        *lines, buffer = buffer.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+
+        for line in lines:
+            # A blank line dispatches the event.
+            if not line:
+                if data:
+                    event.data = "\n".join(data)
+                    yield event
+
+                event = ServerSentEvent()
+                data = []
+                continue
+
+            # Lines starting with a colon are comments, which the API server sends as heartbeats.
+            if line.startswith(":"):
+                continue
+
+            field, _, value = line.partition(":")
+            value = value.removeprefix(" ")
+
+            if field == "event":
+                event.event = value
+
+            elif field == "data":
+                data.append(value)
+
+            elif field == "id":
+                event.id = value
+
+
+class ChangeFeed:
+    """
+    Subscription to the changes made to teams and users on the API server, so that the local data can be kept up to
+    date without downloading the whole event catalogue again. Changes are streamed as server-sent events, falling
+    back to long-polling if the API server does not provide the stream.
+    """
+
+    def __init__(self, api, on_live=None, on_reset=None):
+        self.api = api
+
+        # Called with whether the feed is connected, and when the changes since the cursor were lost.
+        self.on_live = on_live
+        self.on_reset = on_reset
+
+        # Position in the feed of the last change applied, so that a reconnection resumes from it.
+        self.cursor = None
+        self.streaming = True
+        self.live = False
+
+        # Whether anything was received since the last connection was made.
+        self.received = False
+
+        self._stopped = threading.Event()
+        self._response = None
+
+    def run(self, on_changes):
+        """
+        Follow the feed, calling on_changes with each batch of changes, until it is stopped or the API server turns out
+        not to provide one. Runs in the background.
+        """
+
+        delay = BASE_RECONNECT_DELAY
+
+        while not self._stopped.is_set():
+            self.received = False
+
+            try:
+                if self.streaming:
+                    self.stream(on_changes)
+
+                else:
+                    self.poll(on_changes)
+
+            except requests.HTTPError as e:
+                status = e.response.status_code
+
+                if status in UNSUPPORTED_STATUSES:
+                    if self.streaming:
+                        self.streaming = False
+                        continue
+
+                    # Without a feed, the event cache falls back to expiring the catalogue.
+                    break
+
+                if status == CURSOR_EXPIRED_STATUS:
+                    self.cursor = None
+
+                    if self.on_reset is not None:
+                        self.on_reset()
+
+                self.set_live(False)
+
+            except (*CONNECTION_ERRORS, ValueError, KeyError):
+                self.set_live(False)
+
+            except Exception:
+                # Closing the response from stop() interrupts the read with an arbitrary error.
+                if not self._stopped.is_set():
+                    raise
+
+            # A stream which closes straight away, or a poll which returns without waiting, would otherwise be
+            # reconnected in a tight loop, so the delay only goes back down once a change or heartbeat was received.
+            if self.received:
+                delay = BASE_RECONNECT_DELAY
+
+            self._stopped.wait(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+        self.set_live(False)
+
+    def stream(self, on_changes):
+        """
+        Apply the changes from the server-sent events stream as they arrive, until the connection drops.
+        """
+
+        headers = {"Accept": "text/event-stream"}
+
+        if self.cursor is not None:
+            headers["Last-Event-ID"] = self.cursor
+
+        with self.api.get(
+            STREAM_PATH,
+            headers=headers,
+            stream=True,
+            timeout=(self.api.connect_timeout, STREAM_READ_TIMEOUT),
+        ) as response:
+            self._response = response
+
+            response.raise_for_status()
+            self.connected()
+
+            for event in iter_server_sent_events(self.iter_received(response)):
+                if self._stopped.is_set():
+                    return
+
+                if event.event == "change":
+                    on_changes([Change.from_json(json.loads(event.data))])
+
+                if event.id is not None:
+                    self.cursor = event.id
+
+        self._response = None
+
+    def iter_received(self, response):
+        """
+        Iterate over the chunks of the stream, recording that data, including heartbeats, is being received.
+        """
+
+        for chunk in response.iter_content(None):
+            if chunk:
+                self.received = True
+
+            yield chunk
+
+    def poll(self, on_changes):
+        """
+        Wait for the changes since the cursor with a long-poll request, and apply them.
+        """
+
+        # Without a cursor, the request returns straight away with the current one, so that no change is missed
+        # while waiting for the first response.
+        if self.cursor is None:
+            params = {"timeout": 0}
+
+        else:
+            params = {"timeout": POLL_TIMEOUT, "since": self.cursor}
+
+        started = time.monotonic()
+
+        response = self.api.get(
+            POLL_PATH,
+            params=params,
+            timeout=(self.api.connect_timeout, POLL_TIMEOUT + self.api.timeout),
+        )
+        response.raise_for_status()
+
+        self.connected()
+
+        body = response.json()
+        changes = [Change.from_json(change) for change in body["changes"]]
+
+        # An empty response only counts as a heartbeat if the API server held the request open as asked.
+        self.received = (
+            bool(changes) or time.monotonic() - started >= params["timeout"] / 2
+        )
+
+        if self._stopped.is_set():
+            return
+
+        if changes:
+            on_changes(changes)
+
+        self.cursor = body["cursor"]
+
+    def connected(self):
+        """
+        Mark the feed as live. A subscription without a cursor cannot know what changed before it, so the catalogue is reset.
+        """
+
+        fresh = self.cursor is None and not self.live
+
+        self.set_live(True)
+
+        if fresh and self.on_reset is not None:
+            self.on_reset()
+
+    def set_live(self, live):
+        if live == self.live:
+            return
+
+        self.live = live
+
+        if self.on_live is not None:
+            self.on_live(live)
+
+    def stop(self):
+        """
+        Stop following the feed, interrupting the stream if it is open.
+        """
+
+        self._stopped.set()
+
+        response = self._response
+
+        if response is None:
+            return
+
+        # Closing the response would wait for the blocked read to return, so the socket is shut down under it instead.
+        connection = getattr(response.raw, "connection", None)
+        sock = getattr(connection, "sock", None)
+
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+
+            except OSError:
+                pass
@@ -0,0 +1,280 @@
+import threading
+import time
+from dataclasses import replace
+
+from api_client import CONNECTION_ERRORS, NOT_MODIFIED, SingleFlight
+from change_feed import ACTION_DELETE, ACTION_UPSERT, KIND_TEAM, KIND_USER
+from event_registry import EventRegistry, RecordNotFound
+from json_stream import DEFAULT_CHUNK_SIZE, iter_json_array
+from records import Event, Team, User
+
+# Default number of seconds the event catalogue is served from memory before it is fetched again.
+DEFAULT_TTL = 60
+
+
+class EventCache:
+    """
+    In-memory cache of the event catalogue (events -> teams -> members) fetched from the API server, indexed by an
+    EventRegistry. Every download is mirrored into the local store, if one is given.
+
+    While a change feed is live, the downloaded catalogue does not expire. It is kept up to date by applying the changes
+    from the feed instead.
+    """
+
+    def __init__(self, api, ttl=DEFAULT_TTL, store=None):
+        self.api = api
+        self.ttl = ttl
+        self.store = store
+
+        self._registry = None
+        self._fetched_at = 0.0
+
+        # The downloaded registry last written to the local store.
+        self._mirrored = None
+
+        # Whether the change feed is connected, and whether the cached catalogue was downloaded rather than loaded from the local store.
+        self.live = False
+        self._downloaded = False
+
+        # Guard the cached data so concurrent callers trigger at most one download.
+        self._lock = threading.Lock()
+
+        # Guard whether the cached catalogue is fresh. It is only held briefly, so that invalidating the cache from the
+        # GUI thread never waits for a download.
+        self._state_lock = threading.Lock()
+        self.downloads = SingleFlight()
+
+        # Bumped whenever the cache is invalidated, so that a read made afterwards does not share a download which
+        # started before.
+        self._generation = 0
+
+    def is_stale(self):
+        """
+        Check whether the cached event catalogue is missing or older than the TTL, and is not kept up to date by the change feed.
+        """
+
+        if self._registry is None:
+            return True
+
+        if self.live and self._downloaded:
+            return False
+
+        return time.monotonic() - self._fetched_at > self.ttl
+
+    def get_registry(self, force=False, on_event=None):
+        """
+        Get the indexed event catalogue, downloading it from the API server only if the cache is stale.
+        While the API server cannot be reached, the events saved in the local store are served instead.
+        The callback, if given, is called with the partly downloaded registry as each event arrives.
+        """
+
+        # Callers which read the catalogue at the same time, such as the combo boxes filled after logging in, share a
+        # single download along with its result or error. Reads made after the cache is invalidated wait for a new one.
+        return self.downloads.do(
+            self._generation, lambda: self.load_registry(force, on_event)
+        )
+
+    def load_registry(self, force, on_event):
+        with self._lock:
+            if force or self.is_stale():
+                generation = self._generation
+
+                try:
+                    registry = self.download(on_event)
+
+                except CONNECTION_ERRORS:
+                    if self.store is None:
+                        raise
+
+                    # Serve the local mirror, including the changes made while offline, and keep the cache stale so that the next read tries again.
+                    registry = EventRegistry.from_json(self.store.load_events())
+
+                    with self._state_lock:
+                        self._registry = registry
+                        self._downloaded = False
+
+                    return registry
+
+                with self._state_lock:
+                    self._registry = registry
+
+                    # A download which started before the cache was invalidated may not include the change, so it is
+                    # served but stays stale.
+                    if generation == self._generation:
+                        self._downloaded = True
+                        self._fetched_at = time.monotonic()
+
+                # Keep the local mirror in step with the API server. An unchanged catalogue is already mirrored.
+                if self.store is not None and registry is not self._mirrored:
+                    self.store.sync_events(registry.events)
+                    self._mirrored = registry
+
+            return self._registry
+
+    def download(self, on_event=None):
+        """
+        Download the event catalogue, parsing and indexing each event as soon as it has been received so that
+        only one event is held as JSON at a time. If it has not changed since the last download, only the headers are
+        transferred and the registry from then is returned.
+        """
+
+        registry = EventRegistry()
+
+        with self.api.get("/event/", stream=True, conditional=True) as response:
+            # The catalogue has not changed since it was last downloaded, so the registry built then is reused.
+            if response.status_code == NOT_MODIFIED:
+                return self.api.cached_body("/event/")
+
+            response.raise_for_status()
+
+            for data in iter_json_array(
+                self.api.iter_content(response, DEFAULT_CHUNK_SIZE)
+            ):
+                registry.add(Event.from_json(data))
+
+                if on_event is not None:
+                    on_event(registry)
+
+            self.api.cache_body("/event/", response, registry)
+
+        return registry
+
+    def get_events(self, force=False):
+        """
+        Get the details of all the events, downloading them from the API server only if the cache is stale.
+        """
+
+        return self.get_registry(force).events
+
+    def load_from_store(self):
+        """
+        Serve the event catalogue saved in the local store until it is next downloaded, and return it.
+        """
+
+        if self.store is None:
+            return []
+
+        registry = EventRegistry.from_json(self.store.load_events())
+
+        with self._state_lock:
+            # Keep the cache stale so that the next read still downloads the latest catalogue.
+            if self._registry is None and registry.events:
+                self._registry = registry
+                self._fetched_at = time.monotonic() - self.ttl - 1
+
+        return registry.events
+
+    def get_event(self, event_name):
+        """
+        Get the details of the event with the given name. Raises RecordNotFound if there is no such event.
+        """
+
+        return self.get_registry().event(event_name)
+
+    def apply_changes(self, changes):
+        """
+        Apply a batch of changes from the change feed to the cached catalogue and the local store.
+        Returns the records of the events which changed.
+        """
+
+        with self._lock:
+            # Without a catalogue, the next download includes the changes.
+            if self._registry is None:
+                return []
+
+            registry = self._registry
+            changed_event_ids = set()
+            changed_team_ids = set()
+
+            for change in changes:
+                try:
+                    events, team_ids = self.apply_change(registry, change)
+
+                except (RecordNotFound, KeyError, ValueError):
+                    # The change does not fit the cached catalogue, so download it again on the next read.
+                    self.expire()
+                    continue
+
+                changed_event_ids.update(event.id for event in events)
+                changed_team_ids.update(team_ids)
+
+            # Keep the local mirror in step with the cached catalogue.
+            if self.store is not None:
+                for team_id in changed_team_ids:
+                    if team_id in registry.teams:
+                        self.store.save_team(*registry.team(team_id))
+
+                    else:
+                        self.store.remove_team(team_id)
+
+            return [registry.events_by_id[event_id] for event_id in changed_event_ids]
+
+    def apply_change(self, registry, change):
+        """
+        Apply a change to the registry. Returns the changed events and the IDs of the changed teams.
+        """
+
+        data = change.data
+
+        if change.kind == KIND_TEAM and change.action == ACTION_UPSERT:
+            team = Team.from_json(data)
+            event_id = data.get("event_id") or registry.event(data["team_event"]).id
+
+            # Team changes usually carry only the details of the team itself, so the members are kept.
+            if "team_members" not in data and team.id in registry.teams:
+                team = replace(team, members=registry.team(team.id)[1].members)
+
+            return registry.upsert_team(team, event_id), {team.id}
+
+        if change.kind == KIND_TEAM and change.action == ACTION_DELETE:
+            return registry.remove_team(data["id"]), {data["id"]}
+
+        if change.kind == KIND_USER and change.action == ACTION_UPSERT:
+            user = User.from_json(data)
+            team_ids = {user.team_id}
+
+            # A user moved to another team also changes the old team.
+            if user.id in registry.users:
+                team_ids.add(registry.users[user.id][0])
+
+            return registry.upsert_user(user), team_ids
+
+        if change.kind == KIND_USER and change.action == ACTION_DELETE:
+            team_id = registry.users[data["id"]][0]
+
+            return registry.remove_user(data["id"]), {team_id}
+
+        raise ValueError(f"Unknown change: {change.kind} {change.action}.")
+
+    def set_live(self, live):
+        """
+        Record whether the change feed is connected. Once it disconnects, the catalogue expires after the TTL as usual.
+        """
+
+        self.live = live
+
+    def expire(self):
+        """
+        Make the next read download the catalogue again, while still serving the cached one until then. A download
+        which is running, such as the first one after logging in while the change feed subscribes, is not marked fresh.
+        """
+
+        with self._state_lock:
+            self._downloaded = False
+            self._fetched_at = 0.0
+            self._generation += 1
+
+    def invalidate(self):
+        """
+        Drop the cached event catalogue so that the next read fetches it again, which only transfers the headers if it
+        has not changed. While the change feed is live, the cached catalogue is kept up to date by the feed, so it is kept.
+        """
+
+        with self._state_lock:
+            if self.live and self._downloaded:
+                return
+
+            self._registry = None
+            self._downloaded = False
+            self._fetched_at = 0.0
+            self._generation += 1
@@ -0,0 +1,217 @@
+from dataclasses import replace
+from records import Event
+
+
+class RecordNotFound(LookupError):
+    """
+    Raised when an event, team or user is not in the event catalogue.
+    """
+
+
+class EventRegistry:
+    """
+    Indexes of the event catalogue by event name, event ID, team ID and user ID, built once for each download so that
+    every lookup is a dictionary access instead of a scan over the events.
+
+    Changes are applied copy-on-write: the records of a changed team and its event are replaced rather than modified,
+    so that views holding the previous records can diff them against the new ones.
+    """
+
+    def __init__(self, events=()):
+        self.events = []
+
+        self.events_by_name = {}
+        self.events_by_id = {}
+
+        # Teams are indexed along with the ID of their event, and users along with the ID of their team.
+        self.teams = {}
+        self.users = {}
+
+        for event in events:
+            self.add(event)
+
+    @classmethod
+    def from_json(cls, data):
+        """
+        Parse the event catalogue returned by the API server or the local store into records and index them.
+        The data can be any iterable, so events can be indexed as they are streamed in.
+        """
+
+        return cls(Event.from_json(event) for event in data)
+
+    def add(self, event):
+        """
+        Add an event to the catalogue and index it along with its teams and users.
+        """
+
+        self.events.append(event)
+
+        self.events_by_name[event.name] = event
+        self.events_by_id[event.id] = event
+
+        for team in event.teams:
+            self.teams[team.id] = (event.id, team)
+
+        for team, user in event.members():
+            self.users[user.id] = (team.id, user)
+
+    @property
+    def event_names(self):
+        return list(self.events_by_name)
+
+    def event(self, event_name):
+        """
+        Get the event with the given name.
+        """
+
+        try:
+            return self.events_by_name[event_name]
+
+        except KeyError:
+            raise RecordNotFound(f'The event "{event_name}" does not exist.') from None
+
+    def event_by_id(self, event_id):
+        """
+        Get the event with the given ID.
+        """
+
+        try:
+            return self.events_by_id[event_id]
+
+        except KeyError:
+            raise RecordNotFound(f"There is no event with ID {event_id}.") from None
+
+    def select(self, event_names):
+        """
+        Get the events with the given names, in the given order.
+        """
+
+        return [self.event(event_name) for event_name in event_names]
+
+    def team(self, team_id):
+        """
+        Get the event and team of the team with the given ID.
+        """
+
+        try:
+            event_id, team = self.teams[team_id]
+
+        except KeyError:
+            raise RecordNotFound(f"There is no team with ID {team_id}.") from None
+
+        return self.events_by_id[event_id], team
+
+    def user(self, user_id):
+        """
+        Get the event, team and user of the user with the given ID.
+        """
+
+        try:
+            team_id, user = self.users[user_id]
+
+        except KeyError:
+            raise RecordNotFound(f"There is no user with ID {user_id}.") from None
+
+        event, team = self.team(team_id)
+
+        return event, team, user
+
+    def upsert_team(self, team, event_id):
+        """
+        Add or replace a team of the given event along with its members. Returns the changed events.
+        """
+
+        changed = []
+        old = self.teams.get(team.id)
+
+        # A team moved to another event is removed from the old one first.
+        if old is not None and old[0] != event_id:
+            changed.extend(self.remove_team(team.id))
+            old = None
+
+        event = self.event_by_id(event_id)
+
+        if old is None:
+            teams = [*event.teams, team]
+
+        else:
+            teams = [team if t.id == team.id else t for t in event.teams]
+
+            # Members which are no longer in the team are dropped from the index.
+            for user in old[1].members:
+                self.users.pop(user.id, None)
+
+        self.teams[team.id] = (event_id, team)
+
+        for user in team.members:
+            self.users[user.id] = (team.id, user)
+
+        changed.append(self.replace_event(replace(event, teams=teams)))
+
+        return changed
+
+    def remove_team(self, team_id):
+        """
+        Remove a team and its members. Returns the changed events.
+        """
+
+        event, team = self.team(team_id)
+
+        del self.teams[team_id]
+
+        for user in team.members:
+            self.users.pop(user.id, None)
+
+        teams = [t for t in event.teams if t.id != team_id]
+
+        return [self.replace_event(replace(event, teams=teams))]
+
+    def upsert_user(self, user):
+        """
+        Add or replace a user in their team. Returns the changed events.
+        """
+
+        changed = []
+        old = self.users.get(user.id)
+
+        # A user moved to another team is removed from the old one first.
+        if old is not None and old[0] != user.team_id:
+            changed.extend(self.remove_user(user.id))
+            old = None
+
+        event, team = self.team(user.team_id)
+
+        if old is None:
+            members = [*team.members, user]
+
+        else:
+            members = [user if u.id == user.id else u for u in team.members]
+
+        changed.extend(self.upsert_team(replace(team, members=members), event.id))
+
+        return changed
+
+    def remove_user(self, user_id):
+        """
+        Remove a user from their team. Returns the changed events.
+        """
+
+        event, team, _ = self.user(user_id)
+
+        members = [u for u in team.members if u.id != user_id]
+
+        return self.upsert_team(replace(team, members=members), event.id)
+
+    def replace_event(self, event):
+        """
+        Replace the record of an event with the same ID in the catalogue and its indexes. Returns the new record.
+        """
+
+        old = self.events_by_id[event.id]
+
+        self.events = [event if e is old else e for e in self.events]
+
+        self.events_by_name[event.name] = event
+        self.events_by_id[event.id] = event
+
+        return event
@@ -0,0 +1,269 @@
+from dataclasses import replace
+from PySide6.QtCore import QAbstractItemModel, QModelIndex, Qt
+from records import Event
+
+# Number of rows created at a time when the view asks the model for more rows.
+FETCH_BATCH_SIZE = 100
+
+
+class EventTreeNode:
+    """
+    A row of the event member details tree. Its children are only created when the view asks for them.
+    """
+
+    __slots__ = ("parent", "row", "kind", "value", "children")
+
+    def __init__(self, parent, row, kind, value):
+        self.parent = parent
+        self.row = row
+        self.kind = kind
+        self.value = value
+        self.children = []
+
+    def child_count(self):
+        """
+        Get the number of children this node has, whether they have been created yet or not.
+        """
+
+        if self.kind == "event":
+            return len(self.value.teams)
+
+        if self.kind == "team":
+            return 1 + len(self.value.members)
+
+        if self.kind == "member":
+            return len(self.value.fields())
+
+        return 0
+
+    def make_child(self, row):
+        """
+        Create the child node at the given row from the event records.
+        """
+
+        if self.kind == "event":
+            return EventTreeNode(self, row, "team", self.value.teams[row])
+
+        if self.kind == "team":
+            if row == 0:
+                return EventTreeNode(self, row, "field", f"School: {self.value.school}")
+
+            return EventTreeNode(self, row, "member", self.value.members[row - 1])
+
+        label, value = self.value.fields()[row]
+
+        return EventTreeNode(self, row, "field", f"{label}: {value}")
+
+    def text(self):
+        """
+        Get the text displayed for this node.
+        """
+
+        if self.kind == "team":
+            return f"Team ID: {self.value.id}"
+
+        if self.kind == "member":
+            return f"User ID: {self.value.id}"
+
+        return self.value
+
+
+class EventTreeModel(QAbstractItemModel):
+    """
+    Item model over the records of an event which creates rows lazily, so that QTreeView only pays for what is shown.
+    """
+
+    def __init__(self, parent=None):
+        super(EventTreeModel, self).__init__(parent)
+
+        self.root = EventTreeNode(None, 0, "event", Event(None, ""))
+
+        # Set while rows are being inserted or removed, so that the view cannot fetch more rows in the middle of the change.
+        self.changing = False
+
+    def set_event(self, event):
+        """
+        Show the teams and members of the given event.
+        """
+
+        self.changing = True
+        self.beginResetModel()
+        self.root = EventTreeNode(None, 0, "event", event)
+        self.endResetModel()
+        self.changing = False
+
+    def update_event(self, event):
+        """
+        Show the latest details of the event by applying only the rows which were inserted, removed or changed.
+        Expanded rows and the scroll position of the view are kept.
+        """
+
+        # A different event has nothing in common with the shown one, so show it from scratch.
+        if self.root.value.id != event.id:
+            self.set_event(event)
+            return
+
+        self.update_node(QModelIndex(), self.root, event)
+
+    def update_node(self, index, node, value):
+        """
+        Update the node and the rows created under it with the latest value.
+        """
+
+        if node.kind == "event":
+            self.merge_rows(index, node, 0, "teams", value)
+
+        elif node.kind == "team":
+            if node.children:
+                self.set_field(node.children[0], f"School: {value.school}")
+
+            self.merge_rows(index, node, 1, "members", value)
+
+        elif node.kind == "member":
+            node.value = value
+            fields = value.fields()
+
+            for child in node.children:
+                label, field_value = fields[child.row]
+                self.set_field(child, f"{label}: {field_value}")
+
+    def merge_rows(self, index, node, offset, key, value):
+        """
+        Apply a diff keyed by ID between the items shown under the node and the latest items, starting at the given row offset.
+        """
+
+        # If every row was already created, new rows are shown straight away. Otherwise, they are created by fetchMore as usual.
+        fully_fetched = len(node.children) == node.child_count()
+
+        new_items = {item.id: item for item in getattr(value, key)}
+
+        # Work on a copy of the shown items, as the created rows must match them whenever the view queries the model.
+        old_items = list(getattr(node.value, key))
+        node.value = replace(node.value, **{key: old_items})
+
+        # Remove the rows of items which no longer exist, from the bottom up so that the row numbers stay valid.
+        for row in range(len(node.children) - 1, offset - 1, -1):
+            if node.children[row].value.id not in new_items:
+                self.changing = True
+                self.beginRemoveRows(index, row, row)
+
+                del node.children[row]
+                del old_items[row - offset]
+
+                for child in node.children[row:]:
+                    child.row -= 1
+
+                self.endRemoveRows()
+                self.changing = False
+
+        # Keep the remaining items in the order they are shown, followed by the new items. Created rows are always a prefix of this list.
+        old_ids = {item.id for item in old_items}
+        merged_items = [
+            new_items[item.id] for item in old_items if item.id in new_items
+        ]
+        merged_items.extend(
+            item for item in getattr(value, key) if item.id not in old_ids
+        )
+
+        node.value = replace(value, **{key: merged_items})
+
+        # Update the rows which are still shown with the latest details.
+        for child in node.children[offset:]:
+            self.update_node(
+                self.createIndex(child.row, 0, child),
+                child,
+                new_items[child.value.id],
+            )
+
+        if fully_fetched:
+            self.insert_rows(index, node, node.child_count())
+
+    def set_field(self, node, text):
+        """
+        Change the text of a field row, notifying the view only if it changed.
+        """
+
+        if node.value == text:
+            return
+
+        node.value = text
+
+        index = self.createIndex(node.row, 0, node)
+        self.dataChanged.emit(index, index)
+
+    def insert_rows(self, index, node, end):
+        """
+        Create the child rows of the node up to the given row.
+        """
+
+        start = len(node.children)
+
+        if self.changing or start >= end:
+            return
+
+        self.changing = True
+        self.beginInsertRows(index, start, end - 1)
+        node.children.extend(node.make_child(row) for row in range(start, end))
+        self.endInsertRows()
+        self.changing = False
+
+    def node(self, index):
+        """
+        Get the node of the given index, or the root node for an invalid index.
+        """
+
+        if index.isValid():
+            return index.internalPointer()
+
+        return self.root
+
+    def index(self, row, column, parent=QModelIndex()):
+        node = self.node(parent)
+
+        if column != 0 or row < 0 or row >= len(node.children):
+            return QModelIndex()
+
+        return self.createIndex(row, column, node.children[row])
+
+    def parent(self, index=QModelIndex()):
+        if not index.isValid():
+            return QModelIndex()
+
+        parent = index.internalPointer().parent
+
+        if parent is None or parent is self.root:
+            return QModelIndex()
+
+        return self.createIndex(parent.row, 0, parent)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return 0
+
+        # Only the rows which have been created so far are reported. The rest are created by fetchMore.
+        return len(self.node(parent).children)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 1
+
+    def hasChildren(self, parent=QModelIndex()):
+        return self.node(parent).child_count() > 0
+
+    def canFetchMore(self, parent):
+        node = self.node(parent)
+
+        return not self.changing and len(node.children) < node.child_count()
+
+    def fetchMore(self, parent):
+        node = self.node(parent)
+
+        # Create the next batch of child rows.
+        self.insert_rows(
+            parent, node, min(len(node.children) + FETCH_BATCH_SIZE, node.child_count())
+        )
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+
+        return str(index.internalPointer().text())
@@ -0,0 +1,105 @@
+import codecs
+import itertools
+import json
+
+# Number of bytes read from the response at a time.
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+WHITESPACE = " \t\n\r"
+
+# Characters which can continue a number, such as the fraction or exponent of a number split over two chunks.
+NUMBER_CHARACTERS = set("0123456789.eE+-")
+
+
+def iter_json_array(chunks):
+    """
+    Parse a JSON array from an iterable of byte chunks, yielding each element as soon as all of it has been received.
+    Only the element being received is buffered, so the whole array is never held in memory at once.
+
+    >>> list(iter_json_array([b'[{"id": 1}, 2', b'0, 1.', b'5, 1e', b'3, -', b'4]']))
+    [{'id': 1}, 20, 1.5, 1000.0, -4]
+    """
+
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+
+    buffer = ""
+    started = False
+    expect_value = True
+    elements = 0
+
+    # An element which could not be parsed yet is only parsed again once the buffer has doubled, so that a large
+    # element split over many chunks costs a constant number of parses per byte rather than one per chunk.
+    retry_at = 0
+
+    # A final empty chunk flushes the decoder and parses whatever was held back by the retry threshold.
+    for chunk in itertools.chain(chunks, [None]):
+        if chunk is None:
+            buffer += text_decoder.decode(b"", final=True)
+
+        else:
+            buffer += text_decoder.decode(chunk)
+
+            if len(buffer) < retry_at:
+                continue
+
+        pos = 0
+
+        while True:
+            while pos < len(buffer) and buffer[pos] in WHITESPACE:
+                pos += 1
+
+            if pos == len(buffer):
+                break
+
+            if not started:
+                if buffer[pos] != "[":
+                    raise ValueError("The response is not a JSON array.")
+
+                started = True
+                pos += 1
+                continue
+
+            if buffer[pos] == "]":
+                if expect_value and elements:
+                    raise ValueError("Trailing comma in the JSON array.")
+
+                return
+
+            if not expect_value:
+                if buffer[pos] != ",":
+                    raise ValueError(
+                        f"Expected ',' or ']' in the JSON array, found {buffer[pos]!r}."
+                    )
+
+                expect_value = True
+                pos += 1
+                continue
+
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+
+            except json.JSONDecodeError:
+                # The element has not been received in full yet.
+                retry_at = 2 * (len(buffer) - pos)
+                break
+
+            # A number followed by nothing but characters of a number may continue in the next chunk.
+            if (
+                chunk is not None
+                and not isinstance(value, (dict, list, str))
+                and NUMBER_CHARACTERS.issuperset(buffer[end:])
+            ):
+                retry_at = 0
+                break
+
+            retry_at = 0
+            expect_value = False
+            elements += 1
+            pos = end
+
+            yield value
+
+        buffer = buffer[pos:]
+
+    raise ValueError("The JSON array ended before it was closed.")
@@ -0,0 +1,322 @@
+import json
+import sqlite3
+import threading
+from pathlib import Path
+
+# Default location of the local mirror of the event catalogue.
+DEFAULT_PATH = Path.home() / ".management_suite" / "mirror.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    event_name TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS teams (
+    id INTEGER PRIMARY KEY,
+    event_id INTEGER NOT NULL,
+    team_school TEXT NOT NULL,
+    team_event TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    team_id INTEGER NOT NULL,
+    user_name TEXT NOT NULL,
+    user_email TEXT NOT NULL,
+    user_phone TEXT NOT NULL,
+    user_school TEXT NOT NULL,
+    user_attendance INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS teams_event_id ON teams (event_id);
+CREATE INDEX IF NOT EXISTS users_team_id ON users (team_id);
+
+-- Lookups are served by the in-memory event registry, so mirrors created by earlier versions drop what only served
+-- lookups from the store.
+DROP TABLE IF EXISTS sync_state;
+DROP INDEX IF EXISTS events_event_name;
+DROP INDEX IF EXISTS users_user_email;
+DROP INDEX IF EXISTS users_user_phone;
+"""
+
+# Upserts which only touch a row if one of its columns actually changed, so that total_changes counts the delta.
+UPSERT_EVENT = """
+INSERT INTO events (id, event_name) VALUES (:id, :event_name)
+ON CONFLICT (id) DO UPDATE SET event_name = excluded.event_name
+WHERE events.event_name IS NOT excluded.event_name
+"""
+
+UPSERT_TEAM = """
+INSERT INTO teams (id, event_id, team_school, team_event)
+VALUES (:id, :event_id, :team_school, :team_event)
+ON CONFLICT (id) DO UPDATE SET
+    event_id = excluded.event_id,
+    team_school = excluded.team_school,
+    team_event = excluded.team_event
+WHERE (teams.event_id, teams.team_school, teams.team_event)
+    IS NOT (excluded.event_id, excluded.team_school, excluded.team_event)
+"""
+
+UPSERT_USER = """
+INSERT INTO users (id, team_id, user_name, user_email, user_phone, user_school, user_attendance)
+VALUES (:id, :team_id, :user_name, :user_email, :user_phone, :user_school, :user_attendance)
+ON CONFLICT (id) DO UPDATE SET
+    team_id = excluded.team_id,
+    user_name = excluded.user_name,
+    user_email = excluded.user_email,
+    user_phone = excluded.user_phone,
+    user_school = excluded.user_school,
+    user_attendance = excluded.user_attendance
+WHERE (users.team_id, users.user_name, users.user_email, users.user_phone, users.user_school, users.user_attendance)
+    IS NOT (excluded.team_id, excluded.user_name, excluded.user_email, excluded.user_phone, excluded.user_school, excluded.user_attendance)
+"""
+
+# Columns which can be changed by updating a team or user.
+TEAM_COLUMNS = ("team_school", "team_event")
+USER_COLUMNS = (
+    "user_name",
+    "user_email",
+    "user_phone",
+    "user_school",
+    "user_attendance",
+)
+
+
+def team_row(event, team):
+    return {
+        "id": team.id,
+        "event_id": event.id,
+        "team_school": team.school,
+        "team_event": team.event_name or event.name,
+    }
+
+
+def user_row(team, user):
+    return {
+        "id": user.id,
+        "team_id": team.id,
+        "user_name": user.name,
+        "user_email": user.email,
+        "user_phone": user.phone,
+        "user_school": user.school,
+        "user_attendance": user.attendance,
+    }
+
+
+class LocalStore:
+    """
+    On-disk SQLite mirror of the events, teams and users fetched from the API server.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+        # The connection is shared by the background workers, so access to it is serialised with a lock.
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+
+        with self.lock, self.connection:
+            self.connection.executescript(SCHEMA)
+
+    def sync_events(self, events):
+        """
+        Bring the mirror up to date with the given Event records, writing only the rows which changed.
+        Returns the number of rows inserted, updated or deleted.
+        """
+
+        teams = [(event, team) for event in events for team in event.teams]
+        users = [(team, user) for _, team in teams for user in team.members]
+
+        with self.lock, self.connection:
+            changes = self.connection.total_changes
+
+            # The rows are generated as they are written, so the catalogue is never held as dictionaries as well.
+            self.connection.executemany(
+                UPSERT_EVENT,
+                ({"id": event.id, "event_name": event.name} for event in events),
+            )
+            self.connection.executemany(
+                UPSERT_TEAM, (team_row(event, team) for event, team in teams)
+            )
+            self.connection.executemany(
+                UPSERT_USER, (user_row(team, user) for team, user in users)
+            )
+
+            event_ids = [event.id for event in events]
+            team_ids = [team.id for _, team in teams]
+            user_ids = [user.id for _, user in users]
+
+            # Remove the rows which no longer exist on the API server. Rows with negative IDs were added locally while offline and are kept until they are sent.
+            for table, ids in (
+                ("events", event_ids),
+                ("teams", team_ids),
+                ("users", user_ids),
+            ):
+                self.connection.execute(
+                    f"DELETE FROM {table} WHERE id > 0 AND id NOT IN (SELECT value FROM json_each(?))",
+                    (json.dumps(ids),),
+                )
+
+            changes = self.connection.total_changes - changes
+
+        return changes
+
+    def load_events(self):
+        """
+        Rebuild the event catalogue in the same shape as the /event/ response of the API server.
+        """
+
+        with self.lock:
+            events = self.connection.execute(
+                "SELECT * FROM events ORDER BY id"
+            ).fetchall()
+            teams = self.connection.execute(
+                "SELECT * FROM teams ORDER BY id"
+            ).fetchall()
+            users = self.connection.execute(
+                "SELECT * FROM users ORDER BY id"
+            ).fetchall()
+
+        events = {row["id"]: {**dict(row), "event_teams": []} for row in events}
+        teams = {row["id"]: {**dict(row), "team_members": []} for row in teams}
+
+        for user in users:
+            user = dict(user)
+            user["user_attendance"] = bool(user["user_attendance"])
+
+            if user["team_id"] in teams:
+                teams[user["team_id"]]["team_members"].append(user)
+
+        for team in teams.values():
+            if team["event_id"] in events:
+                events[team["event_id"]]["event_teams"].append(team)
+
+        return list(events.values())
+
+    def find_user(self, user_id):
+        """
+        Get the user with the given ID, or None if there is no such user.
+        """
+
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT * FROM users WHERE id = ?", (user_id,)
+            ).fetchone()
+
+        return (
+            None
+            if row is None
+            else {**dict(row), "user_attendance": bool(row["user_attendance"])}
+        )
+
+    def load_team(self, team_id):
+        """
+        Get the team with the given ID along with its members, in the same shape as the /team response of the API server, or None if there is no such team.
+        """
+
+        with self.lock:
+            team = self.connection.execute(
+                "SELECT * FROM teams WHERE id = ?", (team_id,)
+            ).fetchone()
+            users = self.connection.execute(
+                "SELECT * FROM users WHERE team_id = ? ORDER BY id", (team_id,)
+            ).fetchall()
+
+        if team is None:
+            return None
+
+        members = [
+            {**dict(user), "user_attendance": bool(user["user_attendance"])}
+            for user in users
+        ]
+
+        return {**dict(team), "team_members": members}
+
+    def add_team(self, team, users):
+        """
+        Add a team and its members which were registered while offline, using negative IDs until the API server assigns real ones.
+        Returns the added team along with its members.
+        """
+
+        with self.lock, self.connection:
+            team_id = self.next_local_id("teams")
+            user_id = self.next_local_id("users")
+
+            self.connection.execute(UPSERT_TEAM, {**team, "id": team_id})
+            self.connection.executemany(
+                UPSERT_USER,
+                [
+                    {**user, "id": user_id - i, "team_id": team_id}
+                    for i, user in enumerate(users)
+                ],
+            )
+
+        return self.load_team(team_id)
+
+    def next_local_id(self, table):
+        """
+        Get the next unused negative ID of the given table.
+        """
+
+        return self.connection.execute(
+            f"SELECT MIN(0, COALESCE(MIN(id), 0)) - 1 FROM {table}"
+        ).fetchone()[0]
+
+    def save_team(self, event, team):
+        """
+        Write a Team record and its members to the mirror, removing the members which are no longer in the team.
+        """
+
+        with self.lock, self.connection:
+            self.connection.execute(UPSERT_TEAM, team_row(event, team))
+            self.connection.executemany(
+                UPSERT_USER, (user_row(team, user) for user in team.members)
+            )
+            self.connection.execute(
+                "DELETE FROM users WHERE team_id = ? AND id > 0 AND id NOT IN (SELECT value FROM json_each(?))",
+                (team.id, json.dumps([user.id for user in team.members])),
+            )
+
+    def remove_team(self, team_id):
+        """
+        Remove a team and its members, such as a team added while offline once the API server has registered it.
+        """
+
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM users WHERE team_id = ?", (team_id,))
+            self.connection.execute("DELETE FROM teams WHERE id = ?", (team_id,))
+
+    def update_team(self, team_id, details):
+        """
+        Apply the given team details to the mirror, for updates made while offline.
+        """
+
+        self.update_row("teams", TEAM_COLUMNS, team_id, details)
+
+    def update_user(self, user_id, details):
+        """
+        Apply the given user details to the mirror, for updates made while offline.
+        """
+
+        self.update_row("users", USER_COLUMNS, user_id, details)
+
+    def update_row(self, table, columns, row_id, details):
+        # Only known columns are written, as the column names cannot be passed as query parameters.
+        details = {key: value for key, value in details.items() if key in columns}
+
+        if not details:
+            return
+
+        assignments = ", ".join(f"{key} = :{key}" for key in details)
+
+        with self.lock, self.connection:
+            self.connection.execute(
+                f"UPDATE {table} SET {assignments} WHERE id = :id",
+                {**details, "id": row_id},
+            )
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,211 @@
+import json
+import time
+
+# Delivery status of each recipient of a campaign.
+STATUS_PENDING = "pending"
+STATUS_SENT = "sent"
+STATUS_FAILED = "failed"
+STATUS_CANCELLED = "cancelled"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS campaigns (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    sender TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    contents TEXT NOT NULL,
+    attachments TEXT NOT NULL,
+    personalise INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS campaign_recipients (
+    campaign_id INTEGER NOT NULL,
+    recipient TEXT NOT NULL,
+    status TEXT NOT NULL,
+    response TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (campaign_id, recipient)
+);
+
+CREATE INDEX IF NOT EXISTS campaign_recipients_status ON campaign_recipients (campaign_id, status);
+"""
+
+
+class CampaignJournal:
+    """
+    Durable record of every email sent from the mailing list and the delivery status of each of its recipients,
+    stored alongside the local mirror so that an interrupted send can be resumed without mailing anyone twice.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+        with self.store.lock, self.store.connection:
+            self.store.connection.executescript(SCHEMA)
+
+            # Add the columns which journals created by older versions do not have.
+            columns = {
+                row["name"]
+                for row in self.store.connection.execute("PRAGMA table_info(campaigns)")
+            }
+
+            if "personalise" not in columns:
+                self.store.connection.execute(
+                    "ALTER TABLE campaigns ADD COLUMN personalise INTEGER NOT NULL DEFAULT 0"
+                )
+
+    def create(
+        self, sender, subject, contents, attachments, recipients, personalise=False
+    ):
+        """
+        Record a new campaign with every recipient pending, and return its ID.
+        """
+
+        now = time.time()
+
+        with self.store.lock, self.store.connection:
+            campaign_id = self.store.connection.execute(
+                "INSERT INTO campaigns (created_at, sender, subject, contents, attachments, personalise) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    now,
+                    sender,
+                    subject,
+                    contents,
+                    json.dumps(list(attachments)),
+                    personalise,
+                ),
+            ).lastrowid
+
+            self.store.connection.executemany(
+                "INSERT OR IGNORE INTO campaign_recipients (campaign_id, recipient, status, updated_at) VALUES (?, ?, ?, ?)",
+                [
+                    (campaign_id, recipient, STATUS_PENDING, now)
+                    for recipient in recipients
+                ],
+            )
+
+        return campaign_id
+
+    def get(self, campaign_id):
+        """
+        Get the details of the campaign with the given ID.
+        """
+
+        with self.store.lock:
+            row = self.store.connection.execute(
+                "SELECT * FROM campaigns WHERE id = ?", (campaign_id,)
+            ).fetchone()
+
+        return {
+            **dict(row),
+            "attachments": json.loads(row["attachments"]),
+            "personalise": bool(row["personalise"]),
+        }
+
+    def pending_recipients(self, campaign_id):
+        """
+        Get the recipients of the campaign which have not been sent the email yet.
+        """
+
+        with self.store.lock:
+            rows = self.store.connection.execute(
+                "SELECT recipient FROM campaign_recipients WHERE campaign_id = ? AND status = ? ORDER BY rowid",
+                (campaign_id, STATUS_PENDING),
+            ).fetchall()
+
+        return [row["recipient"] for row in rows]
+
+    def record(self, campaign_id, chunk):
+        """
+        Checkpoint the outcome of a chunk sent by the bulk mail dispatcher.
+        """
+
+        now = time.time()
+        failed = chunk.failed
+
+        with self.store.lock, self.store.connection:
+            self.store.connection.executemany(
+                "UPDATE campaign_recipients SET status = ?, response = ?, updated_at = ? WHERE campaign_id = ? AND recipient = ?",
+                [
+                    (
+                        (STATUS_FAILED, failed[recipient], now, campaign_id, recipient)
+                        if recipient in failed
+                        else (STATUS_SENT, chunk.accepted, now, campaign_id, recipient)
+                    )
+                    for recipient in chunk.recipients
+                ],
+            )
+
+    def retry_failed(self, campaign_id):
+        """
+        Mark the failed recipients of the campaign as pending again, so that resuming the campaign retries only them.
+        """
+
+        with self.store.lock, self.store.connection:
+            self.store.connection.execute(
+                "UPDATE campaign_recipients SET status = ?, updated_at = ? WHERE campaign_id = ? AND status = ?",
+                (STATUS_PENDING, time.time(), campaign_id, STATUS_FAILED),
+            )
+
+    def cancel(self, campaign_id):
+        """
+        Mark the pending recipients of the campaign as cancelled, so that the campaign is no longer offered to be resumed.
+        """
+
+        with self.store.lock, self.store.connection:
+            self.store.connection.execute(
+                "UPDATE campaign_recipients SET status = ?, updated_at = ? WHERE campaign_id = ? AND status = ?",
+                (STATUS_CANCELLED, time.time(), campaign_id, STATUS_PENDING),
+            )
+
+    def counts(self, campaign_id):
+        """
+        Get the number of recipients of the campaign with each status.
+        """
+
+        with self.store.lock:
+            rows = self.store.connection.execute(
+                "SELECT status, COUNT(*) AS count FROM campaign_recipients WHERE campaign_id = ? GROUP BY status",
+                (campaign_id,),
+            ).fetchall()
+
+        counts = {
+            STATUS_PENDING: 0,
+            STATUS_SENT: 0,
+            STATUS_FAILED: 0,
+            STATUS_CANCELLED: 0,
+        }
+        counts.update((row["status"], row["count"]) for row in rows)
+
+        return counts
+
+    def failures(self, campaign_id):
+        """
+        Get the recipients of the campaign which could not be sent the email, mapped to the response of the mailing server.
+        """
+
+        with self.store.lock:
+            rows = self.store.connection.execute(
+                "SELECT recipient, response FROM campaign_recipients WHERE campaign_id = ? AND status = ? ORDER BY rowid",
+                (campaign_id, STATUS_FAILED),
+            ).fetchall()
+
+        return {row["recipient"]: row["response"] for row in rows}
+
+    def unfinished(self, sender):
+        """
+        Get the IDs of the campaigns of the sender which still have pending recipients, oldest first.
+        """
+
+        with self.store.lock:
+            rows = self.store.connection.execute(
+                """
+                SELECT DISTINCT campaigns.id FROM campaigns
+                JOIN campaign_recipients ON campaign_recipients.campaign_id = campaigns.id
+                WHERE campaigns.sender = ? AND campaign_recipients.status = ?
+                ORDER BY campaigns.id
+                """,
+                (sender, STATUS_PENDING),
+            ).fetchall()
+
+        return [row["id"] for row in rows]
@@ -0,0 +1,344 @@
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+
+# Send each chunk as one message with the recipients hidden in the envelope, or one message per recipient.
+MODE_BCC = "bcc"
+MODE_INDIVIDUAL = "individual"
+
+# Default number of recipients of each message sent in BCC mode. Office365 rejects messages with more than 500.
+DEFAULT_CHUNK_SIZE = 50
+
+# Default number of messages sent per minute. Office365 throttles mailboxes above 30.
+DEFAULT_RATE_LIMIT = 30
+
+
+class RateLimiter:
+    """
+    Spaces out calls evenly so that no more than the given number happen in each period, across threads.
+    """
+
+    def __init__(self, rate, period=60):
+        self.interval = period / rate
+
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Wait until the next free slot.
+        """
+
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+
+        time.sleep(slot - now)
+
+
+@dataclass
+class ChunkResult:
+    """
+    Outcome of sending one chunk of recipients.
+    """
+
+    index: int
+    recipients: list
+
+    # Recipients refused by the mailing server, mapped to its (code, message) response.
+    refused: dict = field(default_factory=dict)
+
+    # The (code, message) reply of the mailing server once it accepted the message for the other recipients.
+    response: tuple | None = None
+
+    # Error which stopped the whole chunk from being sent.
+    error: Exception | None = None
+
+    elapsed: float = 0.0
+
+    @property
+    def sent(self):
+        return self.error is None
+
+    @property
+    def delivered(self):
+        if self.error is not None:
+            return []
+
+        return [r for r in self.recipients if r not in self.refused]
+
+    @property
+    def accepted(self):
+        """
+        Get the reply of the mailing server which accepted the message, or None if it did not.
+        """
+
+        if self.response is None:
+            return None
+
+        code, message = self.response
+
+        return f"{code} {message.decode(errors='replace')}"
+
+    @property
+    def failed(self):
+        """
+        Get the recipients which were not sent the message, mapped to the reason.
+        """
+
+        if self.error is not None:
+            return {recipient: str(self.error) for recipient in self.recipients}
+
+        return {
+            recipient: f"{code} {message.decode(errors='replace')}"
+            for recipient, (code, message) in self.refused.items()
+        }
+
+
+@dataclass
+class DispatchReport:
+    """
+    Outcome of sending a message to every recipient, with the status of each chunk.
+    """
+
+    chunks: list = field(default_factory=list)
+    elapsed: float = 0.0
+
+    # Whether the dispatch was cancelled before every chunk was sent. The skipped chunks are not reported.
+    cancelled: bool = False
+
+    @property
+    def recipients(self):
+        return sum(len(chunk.recipients) for chunk in self.chunks)
+
+    @property
+    def delivered(self):
+        return [r for chunk in self.chunks for r in chunk.delivered]
+
+    @property
+    def failed(self):
+        return {r: e for chunk in self.chunks for r, e in chunk.failed.items()}
+
+    @property
+    def messages_per_second(self):
+        sent = sum(chunk.sent for chunk in self.chunks)
+
+        return sent / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def recipients_per_second(self):
+        return len(self.delivered) / self.elapsed if self.elapsed else 0.0
+
+
+class DispatchControl:
+    """
+    Lets the GUI pause, resume or cancel a dispatch from another thread. Chunks which have started sending are
+    finished, and the rest wait while paused or are skipped once cancelled.
+    """
+
+    def __init__(self):
+        self.cancelled = False
+
+        # Set while sending is allowed to continue.
+        self._running = threading.Event()
+        self._running.set()
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    def pause(self):
+        self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    def cancel(self):
+        self.cancelled = True
+
+        # Wake up the paused chunks so that they can be skipped.
+        self._running.set()
+
+    def wait(self):
+        """
+        Wait while paused, and return whether the next chunk should be sent.
+        """
+
+        self._running.wait()
+
+        return not self.cancelled
+
+
+@dataclass
+class DispatchProgress:
+    """
+    Running totals of a dispatch, with the rate and the estimated time left.
+    """
+
+    recipients: int
+    messages: int
+
+    sent: int = 0
+    failed: int = 0
+    messages_sent: int = 0
+
+    start: float = field(default_factory=time.monotonic)
+
+    @property
+    def remaining(self):
+        return self.recipients - self.sent - self.failed
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.start
+
+    @property
+    def messages_per_second(self):
+        elapsed = self.elapsed
+
+        return self.messages_sent / elapsed if elapsed else 0.0
+
+    @property
+    def eta(self):
+        """
+        Get the estimated number of seconds left at the current rate, or None before the first message is sent.
+        """
+
+        if not self.messages_sent:
+            return None
+
+        return (self.messages - self.messages_sent) / self.messages_per_second
+
+
+def split_chunks(recipients, size):
+    """
+    Split the recipients into consecutive chunks of at most the given size.
+    """
+
+    return [recipients[i : i + size] for i in range(0, len(recipients), size)]
+
+
+class BulkMailDispatcher:
+    """
+    Send a message to many recipients in chunks over the parallel connections of an SMTP connection pool,
+    paced to stay under the rate limit of the mailing server.
+    """
+
+    def __init__(
+        self,
+        pool,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        mode=MODE_BCC,
+        rate_limit=DEFAULT_RATE_LIMIT,
+    ):
+        self.pool = pool
+        self.chunk_size = chunk_size
+        self.mode = mode
+        self.rate_limiter = RateLimiter(rate_limit) if rate_limit else None
+
+    def send_chunk(
+        self, message, index, chunk, on_chunk_sent=None, personalise=None, control=None
+    ):
+        # Skip the chunk if the dispatch was cancelled while it was queued or paused.
+        if control is not None and not control.wait():
+            return None
+
+        result = ChunkResult(index, chunk)
+
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+
+        start = time.monotonic()
+
+        try:
+            # Personalised emails are rendered by the sending threads, so rendering overlaps with sending.
+            if personalise is not None:
+                subject, contents = personalise(chunk[0])
+                data = message.as_bytes(chunk[0], subject, contents)
+
+            # In BCC mode, the recipients only appear in the envelope, so the message is addressed to the sender. Otherwise, each recipient sees their own address.
+            elif self.mode == MODE_BCC:
+                data = message.as_bytes(message.sender)
+
+            else:
+                data = message.as_bytes(chunk[0])
+
+            result.refused, result.response = self.pool.sendmail(
+                message.envelope_sender, chunk, data
+            )
+
+        except smtplib.SMTPRecipientsRefused as e:
+            result.refused = e.recipients
+
+        except Exception as e:
+            result.error = e
+
+        result.elapsed = time.monotonic() - start
+
+        if on_chunk_sent is not None:
+            on_chunk_sent(result)
+
+        return result
+
+    def dispatch(
+        self,
+        message,
+        recipients,
+        on_chunk_sent=None,
+        personalise=None,
+        control=None,
+        on_progress=None,
+    ):
+        """
+        Send the prepared message to every recipient and report the outcome of each chunk.
+        The callbacks, if given, are called from the sending threads as each chunk is sent, on_progress with a snapshot
+        of the running totals. If personalise is given, each recipient is sent their own message with the subject and
+        body it returns for them. The control, if given, can pause, resume or cancel the dispatch between chunks.
+        """
+
+        individual = self.mode == MODE_INDIVIDUAL or personalise is not None
+        chunks = split_chunks(recipients, 1 if individual else self.chunk_size)
+
+        progress = DispatchProgress(len(recipients), len(chunks))
+        progress_lock = threading.Lock()
+
+        def chunk_sent(result):
+            if on_chunk_sent is not None:
+                on_chunk_sent(result)
+
+            with progress_lock:
+                progress.sent += len(result.delivered)
+                progress.failed += len(result.failed)
+                progress.messages_sent += 1
+
+                snapshot = replace(progress)
+
+            if on_progress is not None:
+                on_progress(snapshot)
+
+        report = DispatchReport()
+
+        with ThreadPoolExecutor(max_workers=self.pool.size) as executor:
+            futures = [
+                executor.submit(
+                    self.send_chunk,
+                    message,
+                    i,
+                    chunk,
+                    chunk_sent,
+                    personalise,
+                    control,
+                )
+                for i, chunk in enumerate(chunks)
+            ]
+
+            results = [future.result() for future in futures]
+
+        report.chunks = [result for result in results if result is not None]
+        report.cancelled = len(report.chunks) < len(chunks)
+        report.elapsed = progress.elapsed
+
+        return report
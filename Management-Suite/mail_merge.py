@@ -0,0 +1,87 @@
+from string import Formatter
+
+from recipients import normalise_email
+
+# Fields which can be used in a personalised email, mapped to how each is read from the event, team and user of the recipient.
+FIELDS = {
+    "name": lambda event, team, user: user.name,
+    "email": lambda event, team, user: user.email,
+    "phone": lambda event, team, user: user.phone,
+    "school": lambda event, team, user: user.school,
+    "team_id": lambda event, team, user: team.id,
+    "event": lambda event, team, user: event.name,
+}
+
+
+class MailTemplate:
+    """
+    A subject or body with {field} placeholders, parsed once so that rendering it for each recipient is only a join.
+    Literal braces are written as {{ and }}.
+    """
+
+    def __init__(self, text):
+        self.parts = []
+
+        for literal, field, spec, conversion in Formatter().parse(text):
+            if field is not None and field not in FIELDS:
+                raise ValueError(
+                    f"Unknown field {{{field}}}. The available fields are: {', '.join(FIELDS)}."
+                )
+
+            # Rendering only inserts the field values, so a conversion or format spec would be silently dropped.
+            if spec or conversion:
+                raise ValueError(
+                    f"The field {{{field}}} cannot be formatted. Write it as {{{field}}} without ! or :."
+                )
+
+            self.parts.append((literal, field))
+
+    def render(self, values):
+        """
+        Fill the placeholders with the given field values.
+        """
+
+        return "".join(
+            literal if field is None else literal + str(values[field])
+            for literal, field in self.parts
+        )
+
+
+def recipient_fields(events):
+    """
+    Get the field values of every recipient in the event catalogue, keyed by normalised email address, in a single pass.
+    A recipient in several teams gets the values of the first one.
+    """
+
+    fields = {}
+
+    for event in events:
+        for team, user in event.members():
+            email = normalise_email(user.email)
+
+            if email not in fields:
+                fields[email] = {
+                    field: read(event, team, user) for field, read in FIELDS.items()
+                }
+
+    return fields
+
+
+def personaliser(subject, contents, events):
+    """
+    Get a function which renders the subject and body for a recipient from the details in the event catalogue.
+    """
+
+    subject_template = MailTemplate(subject)
+    contents_template = MailTemplate(contents)
+    fields = recipient_fields(events)
+
+    def personalise(recipient):
+        values = fields.get(normalise_email(recipient))
+
+        if values is None:
+            raise ValueError(f"{recipient} is not registered for any event.")
+
+        return subject_template.render(values), contents_template.render(values)
+
+    return personalise
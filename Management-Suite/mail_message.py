@@ -0,0 +1,108 @@
+import mimetypes
+import secrets
+from email.message import MIMEPart
+from email.policy import SMTP
+from email.utils import formatdate, make_msgid, parseaddr
+from pathlib import Path
+
+
+class PreparedMessage:
+    """
+    An email whose attachments are encoded once, so that it can be sent to every chunk of recipients with only
+    the headers varying. For personalised emails, only the text part is encoded again for each recipient.
+    """
+
+    def __init__(self, sender, subject, contents, attachments=()):
+        self.sender = sender
+        self.subject = subject
+
+        # The envelope sender is the bare address of the From header.
+        self.envelope_sender = parseaddr(sender)[1]
+        self.domain = self.envelope_sender.rpartition("@")[2] or None
+
+        self.boundary = f"==============={secrets.token_hex(16)}==".encode()
+        self.text = encode_part(text_part(contents))
+
+        # Each attachment is encoded once, along with the boundary which opens it.
+        self.attachments = b"".join(
+            b"--" + self.boundary + b"\r\n" + encode_part(attachment_part(path))
+            for path in attachments
+        )
+
+    def as_bytes(self, to, subject=None, contents=None):
+        """
+        Get the serialised email addressed to the given recipients, optionally with its own subject and body.
+        """
+
+        headers = [
+            fold_header("From", self.sender),
+            fold_header("To", to),
+            fold_header("Subject", self.subject if subject is None else subject),
+            fold_header("Date", formatdate(localtime=True)),
+            fold_header("Message-ID", make_msgid(domain=self.domain)),
+            b"MIME-Version: 1.0\r\n",
+        ]
+
+        text = self.text if contents is None else encode_part(text_part(contents))
+
+        # Without attachments, the text part is the whole body.
+        if not self.attachments:
+            return b"".join(headers) + text
+
+        return b"".join(
+            [
+                *headers,
+                fold_header(
+                    "Content-Type",
+                    f'multipart/mixed; boundary="{self.boundary.decode()}"',
+                ),
+                b"\r\n--",
+                self.boundary,
+                b"\r\n",
+                text,
+                self.attachments,
+                b"--",
+                self.boundary,
+                b"--\r\n",
+            ]
+        )
+
+
+def text_part(contents):
+    part = MIMEPart(policy=SMTP)
+    part.set_content(contents)
+
+    return part
+
+
+def attachment_part(path):
+    path = Path(path)
+
+    # Fall back to a generic binary type for files with an unknown extension.
+    mime_type, _ = mimetypes.guess_type(path.name)
+    maintype, subtype = (mime_type or "application/octet-stream").split("/", 1)
+
+    part = MIMEPart(policy=SMTP)
+    part.set_content(
+        path.read_bytes(), maintype=maintype, subtype=subtype, filename=path.name
+    )
+
+    return part
+
+
+def encode_part(part):
+    """
+    Serialise a MIME part, ending with a line break so that the next boundary can follow it.
+    """
+
+    data = part.as_bytes(policy=SMTP)
+
+    return data if data.endswith(b"\r\n") else data + b"\r\n"
+
+
+def fold_header(name, value):
+    """
+    Serialise a header, encoding any non-ASCII text in it.
+    """
+
+    return SMTP.fold_binary(name, SMTP.header_factory(name, value))
@@ -0,0 +1,120 @@
+from collections import deque
+from PySide6.QtCore import QObject, QThreadPool, Signal
+from mail_dispatcher import DispatchControl
+from workers import Worker
+
+
+class MailSendQueue(QObject):
+    """
+    Sends the queued emails one after another on a background thread, so that the next email can be written while
+    the previous one is still being sent. The email being sent can be paused, resumed or cancelled.
+    """
+
+    # Emitted with the description of the email and a snapshot of its progress as each chunk is sent.
+    progress = Signal(object, object)
+
+    # Emitted with the return value of the send function once an email has been sent or cancelled.
+    sent = Signal(object)
+
+    # Emitted with the exception raised by the send function when an email could not be sent.
+    failed = Signal(object)
+
+    # Emitted whenever an email starts sending or the queue becomes idle.
+    changed = Signal()
+
+    def __init__(self, parent=None):
+        super(MailSendQueue, self).__init__(parent)
+
+        # A single thread sends the emails in the order they were queued. The dispatcher sends each one in parallel.
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(1)
+
+        # Descriptions of the emails waiting to be sent, and the control of the one being sent.
+        self.queued = deque()
+        self.current = None
+        self.control: DispatchControl | None = None
+        self.paused = False
+
+        # Keep a reference to each queued worker so that its signals are not garbage collected before they are delivered.
+        self.workers = set()
+
+    @property
+    def busy(self):
+        return self.current is not None or bool(self.queued)
+
+    def enqueue(self, send, description):
+        """
+        Queue an email. The send function is called on the background thread with a DispatchControl and a progress
+        callback, which it should pass on to the dispatcher.
+        """
+
+        worker = Worker(self.run, send, description)
+
+        worker.signals.result.connect(self.sent)
+        worker.signals.error.connect(self.failed)
+        worker.signals.finished.connect(lambda: self.on_finished(worker))
+
+        self.queued.append(description)
+        self.workers.add(worker)
+        self.thread_pool.start(worker)
+
+        self.changed.emit()
+
+    def run(self, send, description):
+        control = DispatchControl()
+
+        # Emails which start while the queue is paused wait for it to be resumed.
+        if self.paused:
+            control.pause()
+
+        self.queued.popleft()
+        self.current = description
+        self.control = control
+        self.changed.emit()
+
+        try:
+            return send(
+                control, lambda progress: self.progress.emit(description, progress)
+            )
+
+        finally:
+            self.current = None
+            self.control = None
+
+    def on_finished(self, worker):
+        self.workers.discard(worker)
+        self.changed.emit()
+
+    def pause(self):
+        self.paused = True
+
+        if self.control is not None:
+            self.control.pause()
+
+        self.changed.emit()
+
+    def resume(self):
+        self.paused = False
+
+        if self.control is not None:
+            self.control.resume()
+
+        self.changed.emit()
+
+    def cancel(self):
+        """
+        Stop sending the current email once its chunks which are being sent have finished. Queued emails are still sent.
+        """
+
+        if self.control is not None:
+            self.control.cancel()
+
+    def shutdown(self):
+        """
+        Drop the queued emails, cancel the current one and wait for it to stop.
+        """
+
+        self.thread_pool.clear()
+        self.queued.clear()
+        self.cancel()
+        self.thread_pool.waitForDone()
@@ -1,11 +1,72 @@
 import smtplib
-import requests
-import yagmail
-from PySide6.QtWidgets import QFileDialog, QMessageBox
+import registration
+from pathlib import Path
+from PySide6.QtCore import QThreadPool, QTimer
+from PySide6.QtWidgets import QFileDialog, QLabel, QMessageBox, QProgressBar
+from api_client import (
+    APIClient,
+    CONNECTION_ERRORS,
+    CircuitOpen,
+    ClientError,
+    ServerError,
+    describe_error,
+    was_not_sent,
+)
+from change_feed import ChangeFeed
+from event_cache import EventCache
+from event_registry import RecordNotFound
+from event_tree_model import EventTreeModel
+from local_store import LocalStore
+from mail_campaigns import CampaignJournal
+from mail_dispatcher import BulkMailDispatcher, MODE_BCC
+from mail_merge import MailTemplate, personaliser
+from mail_message import PreparedMessage
+from mail_queue import MailSendQueue
+from records import Team, User
+from recipients import MATCH_ALL, MATCH_ANY, resolve_recipients
+from smtp_pool import SMTPConnectionPool
 from ui_MainWindow import *
+from workers import Worker
+from write_queue import WriteConflict, WriteQueue
 
 API_URL = "http://20.219.141.225:8000/api"
 
+# Maximum number of pooled connections kept open to the API server.
+API_POOL_SIZE = 10
+
+# Number of seconds to wait for a connection to the API server, and for its response, before a request times out.
+API_CONNECT_TIMEOUT = 5
+API_TIMEOUT = 10
+
+# Number of times a request which failed because the API server was briefly unavailable is retried.
+API_MAX_RETRIES = 3
+
+# Whether large request bodies, such as bulk registrations, are compressed with gzip. Only enable this if the API server
+# decodes the Content-Encoding of requests.
+API_COMPRESS_REQUESTS = False
+
+# Number of seconds the event catalogue is served from memory before it is downloaded again.
+EVENT_CACHE_TTL = 60
+
+# Location of the local SQLite mirror of the events, teams and users.
+LOCAL_STORE_PATH = Path.home() / ".management_suite" / "mirror.sqlite3"
+
+# Maximum number of team members created on the API server at the same time during on spot registration.
+REGISTRATION_MAX_PARALLEL_REQUESTS = 8
+
+# Number of authenticated connections kept open to the mailing server for sending emails in parallel.
+MAIL_POOL_SIZE = 4
+
+# Emails are sent in chunks of recipients, either as one BCC message per chunk or as one message per recipient.
+MAIL_DISPATCH_MODE = MODE_BCC
+MAIL_CHUNK_SIZE = 50
+
+# Maximum number of messages sent per minute, to stay under the throttling limit of the mailing server.
+MAIL_RATE_LIMIT = 30
+
+# Number of seconds between attempts to send the changes made while the API server could not be reached.
+WRITE_QUEUE_REPLAY_INTERVAL = 15
+
 
 class MainWindow(QMainWindow, Ui_MainWindow):
     def __init__(self):
@@ -17,23 +78,107 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         # API key authentication variables.
         self.api_key: str
 
+        # Shared API client which reuses pooled connections for every request.
+        self.api = APIClient(
+            API_URL,
+            pool_size=API_POOL_SIZE,
+            timeout=API_TIMEOUT,
+            connect_timeout=API_CONNECT_TIMEOUT,
+            max_retries=API_MAX_RETRIES,
+            compress_requests=API_COMPRESS_REQUESTS,
+        )
+
+        # Local mirror of the event catalogue, which survives app restarts.
+        self.local_store = LocalStore(LOCAL_STORE_PATH)
+
+        # Cache of the event catalogue shared by every tab. Every download is mirrored into the local store.
+        self.event_cache = EventCache(
+            self.api, ttl=EVENT_CACHE_TTL, store=self.local_store
+        )
+
+        # Feed of the changes made to teams and users on the API server, which keeps the cached catalogue and the open views up to date.
+        # It runs on its own thread, as it stays connected for as long as the app is open.
+        self.change_feed = ChangeFeed(
+            self.api,
+            on_live=self.event_cache.set_live,
+            on_reset=self.event_cache.expire,
+        )
+        self.change_feed_thread_pool = QThreadPool(self)
+        self.change_feed_thread_pool.setMaxThreadCount(1)
+
+        # Durable queue of the registrations and updates made while the API server could not be reached.
+        self.write_queue = WriteQueue(self.local_store)
+        self.replaying_writes = False
+
+        # Background task variables. All network I/O runs on the thread pool so that the GUI stays responsive.
+        self.thread_pool = QThreadPool()
+        self.background_tasks = 0
+
+        # Keep a reference to each running worker so that its signals are not garbage collected before they are delivered.
+        self.workers = set()
+
+        # Show an indeterminate progress bar in the status bar while background tasks are running.
+        self.busy_indicator = QProgressBar()
+        self.busy_indicator.setRange(0, 0)
+        self.busy_indicator.setMaximumWidth(200)
+        self.busy_indicator.setVisible(False)
+        self.statusBar().addPermanentWidget(self.busy_indicator)
+
+        # Show the number of changes waiting to be sent in the status bar.
+        self.offline_label = QLabel()
+        self.statusBar().addPermanentWidget(self.offline_label)
+        self.update_offline_label()
+
+        # Show the bandwidth saved by compressing the traffic with the API server in the status bar.
+        self.transfer_label = QLabel()
+        self.statusBar().addPermanentWidget(self.transfer_label)
+        self.update_transfer_label()
+
+        # Periodically try to send the queued changes.
+        self.replay_timer = QTimer(self)
+        self.replay_timer.timeout.connect(self.replay_pending_writes)
+        self.replay_timer.start(WRITE_QUEUE_REPLAY_INTERVAL * 1000)
+
         # Connect API key authentication buttons.
         self.api_key_login_button.clicked.connect(self.api_key_auth)
 
-        # Mailing list variables
-        self.server: yagmail.SMTP
+        # Mailing list variables. Connections to the mailing server are pooled and reused between emails.
+        self.mail_pool: SMTPConnectionPool | None = None
+        self.mail_dispatcher: BulkMailDispatcher
+
+        # Journal of the delivery status of every recipient, so that interrupted emails can be resumed.
+        self.campaign_journal = CampaignJournal(self.local_store)
         self.attachments = []
 
+        # Emails are sent one after another in the background, so that the next email can be written in the meantime.
+        self.mail_queue = MailSendQueue(self)
+        self.mail_queue.progress.connect(self.on_send_progress)
+        self.mail_queue.sent.connect(self.on_campaign_sent)
+        self.mail_queue.failed.connect(self.on_send_email_error)
+        self.mail_queue.changed.connect(self.update_send_controls)
+
+        # Latest progress of the email being sent, as (subject, progress).
+        self.send_progress = None
+
         # Connect mailing list buttons.
         self.mailing_list_email_login_button.clicked.connect(self.mailing_list_auth)
         self.mailing_list_send_email_button.clicked.connect(self.send_email)
         self.mailing_list_add_attachments_button.clicked.connect(self.add_attachments)
+        self.mailing_list_pause_button.clicked.connect(self.toggle_send_paused)
+        self.mailing_list_cancel_button.clicked.connect(self.cancel_send)
+
+        # On spot registration variables. Bulk registration is turned off the first time the API server rejects the bulk endpoint.
+        self.bulk_registration_supported = True
 
         # Connect on spot registration buttons.
         self.on_spot_registration_create_team_button.clicked.connect(
             self.on_spot_registration_register_team
         )
 
+        # Show the event member details through a lazily populated model.
+        self.event_member_details_model = EventTreeModel(self)
+        self.event_member_details_tree.setModel(self.event_member_details_model)
+
         # Connect event member details buttons.
         self.event_member_details_refresh_button.clicked.connect(
             self.refresh_event_member_details_tree
@@ -53,19 +198,265 @@ class MainWindow(QMainWindow, Ui_MainWindow):
             self.update_user_details
         )
 
+    def run_in_background(
+        self,
+        fn,
+        on_result=None,
+        on_error=None,
+        on_finished=None,
+        message="Working...",
+        on_progress=None,
+    ):
+        """
+        Run the given function on the thread pool and deliver its outcome to the callbacks on the GUI thread.
+        If on_progress is given, the function is passed an on_progress callback for reporting partial results.
+        """
+
+        worker = Worker(fn)
+
+        if on_progress is not None:
+            worker.kwargs["on_progress"] = worker.signals.progress.emit
+            worker.signals.progress.connect(on_progress)
+
+        if on_result is not None:
+            worker.signals.result.connect(on_result)
+
+        # Show any unexpected error to the user unless the caller handles it.
+        worker.signals.error.connect(on_error or self.show_background_error)
+
+        worker.signals.finished.connect(lambda: self.workers.discard(worker))
+        worker.signals.finished.connect(self.end_background_task)
+
+        if on_finished is not None:
+            worker.signals.finished.connect(on_finished)
+
+        self.workers.add(worker)
+        self.begin_background_task(message)
+        self.thread_pool.start(worker)
+
+    def begin_background_task(self, message):
+        """
+        Show the busy state while a background task is running.
+        """
+
+        self.background_tasks += 1
+
+        self.busy_indicator.setVisible(True)
+        self.statusBar().showMessage(message)
+
+    def end_background_task(self):
+        """
+        Clear the busy state once every background task has finished.
+        """
+
+        self.background_tasks -= 1
+
+        if self.background_tasks == 0:
+            self.busy_indicator.setVisible(False)
+            self.statusBar().clearMessage()
+
+        self.update_transfer_label()
+
+    def show_background_error(self, error):
+        """
+        Alert the user that a background task failed.
+        """
+
+        # An event, team or user which is missing from the event catalogue is not an unexpected error.
+        if isinstance(error, RecordNotFound):
+            QMessageBox.warning(self, "Not found", str(error))
+            return
+
+        # Errors talking to the API server are explained rather than shown as raw exceptions.
+        description = describe_error(error)
+
+        if description is not None:
+            QMessageBox.warning(self, *description)
+            return
+
+        QMessageBox.warning(self, "Error", f"An error occurred: {error}")
+
+    def update_offline_label(self):
+        """
+        Show how many changes are waiting to be sent to the API server, if any.
+        """
+
+        pending_writes = self.write_queue.count()
+
+        self.offline_label.setText(
+            f"Offline: {pending_writes} change(s) waiting to be sent"
+        )
+        self.offline_label.setVisible(pending_writes > 0)
+
+    def update_transfer_label(self):
+        """
+        Show how many bytes were exchanged with the API server and how much compression saved, with the numbers for
+        each endpoint in the tooltip.
+        """
+
+        endpoints, total = self.api.metrics.snapshot()
+
+        self.transfer_label.setText(
+            f"API: {total.wire / 1024:.0f} KiB transferred, {total.saved:.0%} saved"
+        )
+        self.transfer_label.setToolTip(
+            "\n".join(
+                f"{endpoint}: {stats.requests} request(s), {stats.raw / 1024:.0f} KiB raw, "
+                f"{stats.wire / 1024:.0f} KiB over the network ({stats.saved:.0%} saved)"
+                for endpoint, stats in sorted(endpoints.items())
+            )
+        )
+        self.transfer_label.setVisible(total.requests > 0)
+
+    def replay_pending_writes(self):
+        """
+        Send the changes queued while offline, in the order they were made, once the API server can be reached again.
+        """
+
+        # Wait for the previous attempt to finish, and do nothing until logged in with the API key.
+        if self.replaying_writes or "api-key" not in self.api.session.params:
+            return
+
+        if not self.write_queue.count():
+            return
+
+        self.replaying_writes = True
+
+        self.run_in_background(
+            lambda: self.write_queue.replay(
+                {
+                    "register_team": self.replay_team_registration,
+                    "update": self.replay_update,
+                }
+            ),
+            on_result=self.on_pending_writes_replayed,
+            on_finished=self.on_pending_writes_replay_finished,
+            message="Sending changes made while offline...",
+        )
+
+    def replay_team_registration(self, payload):
+        """
+        Register a team which was queued while offline. Runs in the background.
+        """
+
+        use_bulk = self.bulk_registration_supported
+
+        try:
+            result = registration.register_team(
+                self.api,
+                payload["team"],
+                payload["users"],
+                max_workers=REGISTRATION_MAX_PARALLEL_REQUESTS,
+                use_bulk=use_bulk,
+            )
+
+        except CONNECTION_ERRORS as e:
+            # Sending the team again would register it twice if it reached the API server, so it is only retried if it was never sent.
+            if isinstance(e, CircuitOpen) or was_not_sent(e):
+                raise
+
+            # The API server may have registered the team, so its local copy is dropped and shown again from the catalogue if it did.
+            self.local_store.remove_team(payload["local_team_id"])
+            self.event_cache.invalidate()
+
+            raise WriteConflict(
+                f"The connection was lost after the team from {payload['team']['team_school']} for {payload['team']['team_event']} was sent, so it may or may not have been registered. Please check the team list before registering it again."
+            )
+
+        if use_bulk and not result.bulk:
+            self.bulk_registration_supported = False
+
+        if not result.team_created:
+            raise WriteConflict(
+                f"The team from {payload['team']['team_school']} for {payload['team']['team_event']} was rejected by the API server."
+            )
+
+        # The team now exists on the API server, so its local copy is dropped.
+        self.local_store.remove_team(payload["local_team_id"])
+        self.event_cache.invalidate()
+
+        if result.failed_members:
+            failed_members = ", ".join(
+                f"{user['user_name']} ({error})"
+                for user, error in result.failed_members
+            )
+
+            raise WriteConflict(
+                f"Team {result.team['id']} was registered, but the following members were rejected: {failed_members}"
+            )
+
+    def replay_update(self, payload):
+        """
+        Update a team or user which was changed while offline. Runs in the background.
+        """
+
+        response = self.api.put(
+            payload["path"], json=payload["data"], params=payload["params"]
+        )
+
+        # The API server applied the change.
+        if 200 <= response.status_code < 300:
+            self.event_cache.invalidate()
+            return
+
+        # The API server rejected the change, so retrying it would not help. Rate limiting is not a rejection.
+        if 400 <= response.status_code < 500 and response.status_code != 429:
+            raise WriteConflict(
+                f"The update of {payload['path']} {payload['params']} was rejected by the API server: {response.status_code} {response.reason}"
+            )
+
+        # The API server did not apply the change, so it is retried later.
+        raise ServerError(
+            f"The API server did not apply the update: {response.status_code} {response.reason}",
+            response=response,
+        )
+
+    def on_pending_writes_replayed(self, result):
+        """
+        Alert the user of the queued changes which the API server rejected.
+        """
+
+        if result.conflicts:
+            conflicts = "\n".join(error for _, error in result.conflicts)
+
+            QMessageBox.warning(
+                self,
+                "Changes rejected",
+                f"The following changes made while offline could not be applied:\n\n{conflicts}",
+            )
+
+    def on_pending_writes_replay_finished(self):
+        self.replaying_writes = False
+        self.update_offline_label()
+
     def api_key_auth(self):
         """
         Authenticate the event head through the API.
         """
 
-        # Get API key entered by user and validate it with the API.
+        # Get API key entered by user and validate it with the API in the background.
         api_key = self.api_key_field.text()
-        request = requests.get(f"{API_URL}/api-key", params={"api-key": api_key})
+
+        # Disable the login button to prevent duplicate requests.
+        self.api_key_login_button.setEnabled(False)
+
+        self.run_in_background(
+            lambda: self.api.get("/api-key", params={"api-key": api_key}),
+            on_result=lambda request: self.on_api_key_validated(api_key, request),
+            on_error=self.on_api_key_auth_error,
+            message="Logging in...",
+        )
+
+    def on_api_key_validated(self, api_key, request):
+        """
+        Enable the app if the API server accepted the API key.
+        """
 
         # Check if validation was successful
         if request.status_code == 200:
             # Set the instance API key variable to the entered API key.
             self.api_key = api_key
+            self.api.set_api_key(api_key)
             QMessageBox.information(
                 self, "Success!", f"Successfully logged in as {request.json()['user']}!"
             )
@@ -83,123 +474,229 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
         QMessageBox.warning(self, "Invalid Credentials", "Invalid API key!")
 
+        self.api_key_login_button.setEnabled(True)
+
+    def on_api_key_auth_error(self, error):
+        """
+        Alert the user that the API server could not be reached and allow them to try again.
+        """
+
+        title, message = describe_error(error) or ("Error", str(error))
+
+        QMessageBox.warning(
+            self, title, f"An error occurred while logging in: {message}"
+        )
+
+        self.api_key_login_button.setEnabled(True)
+
     def post_api_key_auth(self):
         """
         Run post API key authentication procedures.
         """
+
+        # Follow the changes made on the API server from now on.
+        self.start_change_feed()
+
+        # Fill the combo boxes straight away from the local mirror saved by a previous session, if there is one.
+        events = self.event_cache.load_from_store()
+
+        if events:
+            self.on_event_names_loaded([event.name for event in events])
+
+        # Load the latest event catalogue in the background, then fill the combo boxes with the event names.
+        # Without a local mirror, the combo boxes are filled as each event is downloaded.
+        self.run_in_background(
+            self.load_event_names,
+            on_result=self.on_event_names_loaded,
+            on_progress=None if events else self.on_event_names_loaded,
+            message="Loading events...",
+        )
+
+    def start_change_feed(self):
+        """
+        Follow the change feed in the background, delivering the changed events to the GUI thread.
+        """
+
+        # The feed is already followed if the user logged in again.
+        if self.change_feed_thread_pool.activeThreadCount():
+            return
+
+        worker = Worker(self.follow_change_feed)
+        worker.kwargs["on_progress"] = worker.signals.progress.emit
+
+        worker.signals.progress.connect(self.on_events_changed)
+        worker.signals.error.connect(self.show_background_error)
+        worker.signals.finished.connect(lambda: self.workers.discard(worker))
+
+        self.workers.add(worker)
+        self.change_feed_thread_pool.start(worker)
+
+    def follow_change_feed(self, on_progress):
+        """
+        Apply each batch of changes from the change feed to the event cache, and report the changed events. Runs in the background.
+        """
+
+        self.change_feed.run(
+            lambda changes: on_progress(self.event_cache.apply_changes(changes))
+        )
+
+    def on_events_changed(self, events):
+        """
+        Show the changes made on the API server in the open views, without downloading the event catalogue again.
+        """
+
+        shown_event = self.event_member_details_model.root.value
+
+        for event in events:
+            # Only the rows which changed are updated, keeping the expanded rows and scroll position.
+            if event.id == shown_event.id:
+                self.event_member_details_model.update_event(event)
+
+    def load_event_names(self, on_progress=None):
+        """
+        Get the names of all the events, reporting the names downloaded so far as each event arrives. Runs in the background.
+        """
+
+        on_event = None
+
+        if on_progress is not None:
+            on_event = lambda registry: on_progress(registry.event_names)
+
+        return self.event_cache.get_registry(on_event=on_event).event_names
+
+    def on_event_names_loaded(self, event_names):
+        """
+        Fill the combo boxes of every tab with the loaded event names, replacing any names shown before.
+        """
+
         # Fill the mailing list recipients combo box with the event names.
-        self.fill_mailing_list_recipients_combo_box()
+        self.fill_mailing_list_recipients_list(event_names)
 
         # Fill the on spot registration combo box with the event names.
-        self.fill_on_spot_registration_event_combo_box()
+        self.fill_on_spot_registration_event_combo_box(event_names)
 
         # Fill the event member details combo box.
-        self.fill_member_details_combo_box()
+        self.fill_member_details_combo_box(event_names)
 
     def mailing_list_auth(self):
         """
         Log into the mailing server with the entered credentials.
         """
-        try:
-            # Get the entered email address and email password.
-            email_address = self.mailing_list_email_address_field.text()
-            email_password = self.mailing_list_email_password_field.text()
 
-            # Initialise a yagmail.SMTP instance with the entered email address and email password. This does not check if the entered credentials are correct.
-            self.server = yagmail.SMTP(
-                email_address,
-                email_password,
-                host="smtp.office365.com",
-                port=587,
-                smtp_starttls=True,
-                smtp_ssl=False,
-            )
+        # Get the entered email address and email password.
+        email_address = self.mailing_list_email_address_field.text()
+        email_password = self.mailing_list_email_password_field.text()
 
-            # Try sending a test email. If authentication fails, this does not work, and we can catch the smtplib.SMTPAuthenticationError.
-            self.server.send(to="test@gmail.com", subject="test")
+        # Disable the login button to prevent duplicate logins.
+        self.mailing_list_email_login_button.setEnabled(False)
 
-            QMessageBox.information(
-                self, "Success!", f"Successfully logged into {email_address}!"
-            )
+        self.run_in_background(
+            lambda: self.connect_mail_server(email_address, email_password),
+            on_result=lambda mail_pool: self.on_mail_server_connected(
+                email_address, mail_pool
+            ),
+            on_error=self.on_mailing_list_auth_error,
+            message="Logging into the mailing server...",
+        )
 
-            # Disable the email authentication fields.
-            self.mailing_list_email_address_field.setEnabled(False)
-            self.mailing_list_email_password_field.setEnabled(False)
-            self.mailing_list_email_login_button.setEnabled(False)
+    def connect_mail_server(self, email_address, email_password):
+        """
+        Connect to the mailing server and check that the credentials are correct. Runs in the background.
+        """
 
-            # Enable the main email fields.
-            self.mailing_list_recipients_combo_box.setEnabled(True)
-            self.mailing_list_subject_field.setEnabled(True)
-            self.mailing_list_mail_body_field.setEnabled(True)
-            self.mailing_list_add_attachments_button.setEnabled(True)
-            self.mailing_list_send_email_button.setEnabled(True)
+        # Initialise a pool of connections to the mailing server with the entered email address and email password. This does not connect yet.
+        mail_pool = SMTPConnectionPool(
+            email_address, email_password, size=MAIL_POOL_SIZE
+        )
+
+        # Log in without sending anything. If authentication fails, we can catch the smtplib.SMTPAuthenticationError.
+        mail_pool.verify()
 
-        except smtplib.SMTPAuthenticationError:
-            # The test email was not sent, as the authentication fails. Alert that the credentials are invalid.
+        return mail_pool
+
+    def on_mail_server_connected(self, email_address, mail_pool):
+        """
+        Enable the mailing list once the mailing server has accepted the credentials.
+        """
+
+        self.mail_pool = mail_pool
+
+        # Send bulk emails in paced chunks over the pooled connections.
+        self.mail_dispatcher = BulkMailDispatcher(
+            mail_pool,
+            chunk_size=MAIL_CHUNK_SIZE,
+            mode=MAIL_DISPATCH_MODE,
+            rate_limit=MAIL_RATE_LIMIT,
+        )
+
+        QMessageBox.information(
+            self, "Success!", f"Successfully logged into {email_address}!"
+        )
+
+        # Disable the email authentication fields.
+        self.mailing_list_email_address_field.setEnabled(False)
+        self.mailing_list_email_password_field.setEnabled(False)
+        self.mailing_list_email_login_button.setEnabled(False)
+
+        # Enable the main email fields.
+        self.mailing_list_recipients_list.setEnabled(True)
+        self.mailing_list_recipients_match_combo_box.setEnabled(True)
+        self.mailing_list_attendance_combo_box.setEnabled(True)
+        self.mailing_list_subject_field.setEnabled(True)
+        self.mailing_list_mail_body_field.setEnabled(True)
+        self.mailing_list_add_attachments_button.setEnabled(True)
+        self.mailing_list_personalise_check_box.setEnabled(True)
+        self.mailing_list_send_email_button.setEnabled(True)
+
+        # Offer to finish the emails which were interrupted in a previous session.
+        self.resume_unfinished_campaigns()
+
+    def on_mailing_list_auth_error(self, error):
+        """
+        Alert the user that logging into the mailing server failed and allow them to try again.
+        """
+
+        if isinstance(error, smtplib.SMTPAuthenticationError):
+            # The mailing server rejected the credentials. Alert that the credentials are invalid.
             QMessageBox.warning(
                 self, "Invalid Credentials", "Invalid email address or password!"
             )
 
-        except Exception as e:
+        else:
             QMessageBox.warning(
-                self, "Error", f"An error occurred while logging in: {e}"
+                self, "Error", f"An error occurred while logging in: {error}"
             )
 
-    def fill_mailing_list_recipients_combo_box(self):
+        self.mailing_list_email_login_button.setEnabled(True)
+
+    def fill_mailing_list_recipients_list(self, event_names):
         """
-        Get the event names from the API and fill the mailing list recipients combo box with the event names.
+        Fill the mailing list recipients list with the event names, keeping the checked events checked.
         """
 
-        # Request the API server for the details of all the events.
-        event_details = requests.get(
-            f"{API_URL}/event/", params={"api-key": self.api_key}
-        ).json()
+        checked_event_names = set(self.get_checked_recipient_events())
 
-        # Add all participants as an entry to the combo box.
-        self.mailing_list_recipients_combo_box.addItem("All Participants")
+        self.mailing_list_recipients_list.clear()
 
-        # Add each event name as an entry to the combo box.
-        for event in event_details:
-            self.mailing_list_recipients_combo_box.addItem(event["event_name"])
+        # Add each event name as a checkable entry to the list.
+        for event_name in event_names:
+            item = QListWidgetItem(event_name, self.mailing_list_recipients_list)
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            item.setCheckState(
+                Qt.Checked if event_name in checked_event_names else Qt.Unchecked
+            )
 
-    def get_recipients(self):
+    def get_checked_recipient_events(self):
         """
-        Get the email addresses of the users registered for the chosen event.
+        Get the names of the events checked in the mailing list recipients list.
         """
 
-        # Get the event chosen in the combo box.
-        selection = self.mailing_list_recipients_combo_box.currentText()
-
-        # Request the API server for the details of all events.
-        data = requests.get(
-            f"{API_URL}/event/", params={"api-key": self.api_key}
-        ).json()
-
-        # If the selection is all participants, request the API server for the email addresses of the all the users registered for Mathtrix.
-        if selection == "All Participants":
-            return [
-                user["user_email"]
-                for event in data
-                for team in event["event_teams"]
-                for user in team["team_members"]
-            ]
+        items = (
+            self.mailing_list_recipients_list.item(row)
+            for row in range(self.mailing_list_recipients_list.count())
+        )
 
-        # Get the event ID of the chosen event.
-        for event in data:
-            if event["event_name"] == selection:
-                event_id = event["id"]
-
-        # Request the API server for all the users registered to the event using the event ID retrieved earlier.
-        data = requests.get(
-            f"{API_URL}/event", params={"api-key": self.api_key, "event_id": event_id}
-        ).json()
-
-        # Return the email addresses of all the users from the retrieved user data.
-        return [
-            user["user_email"]
-            for team in data["event_teams"]
-            for user in team["team_members"]
-        ]
+        return [item.text() for item in items if item.checkState() == Qt.Checked]
 
     def add_attachments(self):
         """
@@ -228,52 +725,368 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
     def send_email(self):
         """
-        Send the email.
+        Send the email, once the user has confirmed how many recipients it is sent to.
+        """
+
+        # Get the text entered in the fields as data.
+        event_names = self.get_checked_recipient_events()
+        match = (MATCH_ANY, MATCH_ALL)[
+            self.mailing_list_recipients_match_combo_box.currentIndex()
+        ]
+        attendance = (None, True, False)[
+            self.mailing_list_attendance_combo_box.currentIndex()
+        ]
+        subject = self.mailing_list_subject_field.text()
+        contents = self.mailing_list_mail_body_field.toPlainText()
+        attachments = list(self.attachments)
+        personalise = self.mailing_list_personalise_check_box.isChecked()
+
+        # Check the placeholders of a personalised email before anything is sent.
+        if personalise:
+            try:
+                MailTemplate(subject)
+                MailTemplate(contents)
+
+            except ValueError as e:
+                QMessageBox.warning(self, "Invalid placeholders", str(e))
+                return
+
+        # Disable the send button until the email has been queued.
+        self.mailing_list_send_email_button.setEnabled(False)
+
+        # Work out the recipients from the chosen events in the background, so that the user can confirm how many there are.
+        self.run_in_background(
+            lambda: self.resolve_recipients(event_names, match, attendance),
+            on_result=lambda resolution: self.confirm_send_email(
+                resolution, subject, contents, attachments, personalise
+            ),
+            on_error=self.on_resolve_recipients_error,
+            message="Finding recipients...",
+        )
+
+    def resolve_recipients(self, event_names, match, attendance):
+        """
+        Get the recipients of the chosen events, or of every event if none are chosen. Runs in the background.
+        """
+
+        registry = self.event_cache.get_registry()
+
+        # Only the chosen events are read. Raises RecordNotFound if one of them no longer exists.
+        events = registry.select(event_names) if event_names else registry.events
+
+        return resolve_recipients(events, event_names, match, attendance)
+
+    def confirm_send_email(
+        self, resolution, subject, contents, attachments, personalise
+    ):
         """
+        Ask the user to confirm the number of recipients, then send the email to them.
+        """
+
+        if not resolution.recipients:
+            QMessageBox.warning(
+                self, "No recipients", "No participants match the chosen recipients!"
+            )
+            self.mailing_list_send_email_button.setEnabled(True)
+            return
+
+        duplicates = (
+            f" {resolution.duplicates} duplicate registration(s) will only be sent the email once."
+            if resolution.duplicates
+            else ""
+        )
+
         confirmation_dialog = QMessageBox.question(
-            self, "Confirmation", "Are you sure you want to send this email?"
+            self,
+            "Confirmation",
+            f"Are you sure you want to send this email to {len(resolution.recipients)} recipient(s)?{duplicates}",
         )
 
-        if confirmation_dialog == QMessageBox.Yes:
-            try:
-                # Send the email using the yagmail.SMTP instance using the text entered in the fields as data.
-                self.server.send(
-                    to=self.get_recipients(),
-                    subject=self.mailing_list_subject_field.text(),
-                    contents=self.mailing_list_mail_body_field.toPlainText(),
-                    attachments=self.attachments,
-                )
+        self.mailing_list_send_email_button.setEnabled(True)
+
+        if confirmation_dialog != QMessageBox.Yes:
+            return
+
+        # Queue the email to be sent to the recipients in chunks over the pooled connections to the mailing server in the background.
+        self.mail_queue.enqueue(
+            lambda control, on_progress: self.start_campaign(
+                resolution.recipients,
+                subject,
+                contents,
+                attachments,
+                personalise,
+                control,
+                on_progress,
+            ),
+            subject,
+        )
+
+        # Clear the previously entered data, so that the next email can be written while this one is being sent.
+        self.attachments.clear()
+        self.attachments_label.setText("Attachments:")
+
+        self.mailing_list_subject_field.clear()
+        self.mailing_list_mail_body_field.clear()
+
+    def on_resolve_recipients_error(self, error):
+        """
+        Alert the user that the recipients could not be found and allow them to try again.
+        """
+
+        title, message = describe_error(error) or ("Error", str(error))
+
+        QMessageBox.warning(
+            self, title, f"An error occurred while finding the recipients: {message}"
+        )
+
+        self.mailing_list_send_email_button.setEnabled(True)
+
+    def start_campaign(
+        self,
+        recipients,
+        subject,
+        contents,
+        attachments,
+        personalise,
+        control=None,
+        on_progress=None,
+    ):
+        """
+        Record the email in the campaign journal with every recipient pending, then send it. Runs in the background.
+        """
+
+        campaign_id = self.campaign_journal.create(
+            self.mail_pool.email_address,
+            subject,
+            contents,
+            attachments,
+            recipients,
+            personalise,
+        )
+
+        return self.run_campaign(campaign_id, control, on_progress)
+
+    def run_campaign(self, campaign_id, control=None, on_progress=None):
+        """
+        Send the email of the campaign to its pending recipients, checkpointing every chunk in the journal. Runs in the background.
+        """
+
+        campaign = self.campaign_journal.get(campaign_id)
+
+        # Encode the attachments once for every recipient.
+        message = PreparedMessage(
+            campaign["sender"],
+            campaign["subject"],
+            campaign["contents"],
+            campaign["attachments"],
+        )
+
+        # Render personalised emails from the details of each recipient in the cached event catalogue.
+        personalise = None
+
+        if campaign["personalise"]:
+            personalise = personaliser(
+                campaign["subject"],
+                campaign["contents"],
+                self.event_cache.get_events(),
+            )
+
+        report = self.mail_dispatcher.dispatch(
+            message,
+            self.campaign_journal.pending_recipients(campaign_id),
+            on_chunk_sent=lambda chunk: self.campaign_journal.record(
+                campaign_id, chunk
+            ),
+            personalise=personalise,
+            control=control,
+            on_progress=on_progress,
+        )
+
+        return campaign_id, report
+
+    def send_campaign(self, campaign_id):
+        """
+        Queue the email of a campaign which was recorded before to be sent to its pending recipients in the background.
+        """
+
+        self.mail_queue.enqueue(
+            lambda control, on_progress: self.run_campaign(
+                campaign_id, control, on_progress
+            ),
+            self.campaign_journal.get(campaign_id)["subject"],
+        )
+
+    def on_send_progress(self, subject, progress):
+        """
+        Show the progress of the email being sent.
+        """
+
+        self.send_progress = (subject, progress)
+        self.update_send_controls()
+
+    def update_send_controls(self):
+        """
+        Update the progress bar, progress label and the pause and cancel buttons from the state of the mail queue.
+        """
 
-                # Clear the previously entered data.
-                self.attachments.clear()
-                self.attachments_label.setText("Attachments:")
+        busy = self.mail_queue.busy
 
-                self.mailing_list_subject_field.clear()
-                self.mailing_list_mail_body_field.clear()
+        self.mailing_list_send_progress_bar.setEnabled(busy)
+        self.mailing_list_pause_button.setEnabled(busy)
+        self.mailing_list_cancel_button.setEnabled(self.mail_queue.current is not None)
+        self.mailing_list_pause_button.setText(
+            "Resume" if self.mail_queue.paused else "Pause"
+        )
 
-                QMessageBox.information(self, "Success!", "Email successfully sent!")
+        if not busy:
+            self.send_progress = None
+            self.mailing_list_send_progress_bar.setRange(0, 100)
+            self.mailing_list_send_progress_bar.setValue(0)
+            self.mailing_list_send_progress_label.setText("No emails are being sent.")
+            return
 
-            except Exception as e:
-                QMessageBox.warning(
-                    self, "Error", f"An error occurred while sending the email: {e}"
-                )
+        if self.send_progress is None:
+            self.mailing_list_send_progress_bar.setRange(0, 0)
+            status = f'Sending "{self.mail_queue.current or ""}"...'
 
         else:
-            pass
+            subject, progress = self.send_progress
+
+            self.mailing_list_send_progress_bar.setRange(0, progress.recipients)
+            self.mailing_list_send_progress_bar.setValue(
+                progress.sent + progress.failed
+            )
+
+            eta = ""
+
+            if progress.eta is not None:
+                minutes, seconds = divmod(round(progress.eta), 60)
+                eta = f", about {minutes}m {seconds:02d}s left"
+
+            status = f'Sending "{subject}": {progress.sent} sent, {progress.failed} failed, {progress.remaining} remaining, {progress.messages_per_second:.2f} messages/s{eta}'
+
+        if self.mail_queue.paused:
+            status += " (paused)"
+
+        if self.mail_queue.queued:
+            status += f". {len(self.mail_queue.queued)} more email(s) queued."
+
+        self.mailing_list_send_progress_label.setText(status)
+
+    def toggle_send_paused(self):
+        """
+        Pause or resume sending emails. Messages which are already being sent are finished.
+        """
+
+        if self.mail_queue.paused:
+            self.mail_queue.resume()
+
+        else:
+            self.mail_queue.pause()
+
+    def cancel_send(self):
+        """
+        Stop sending the current email, once the user has confirmed it. Its remaining recipients stay pending in the campaign journal.
+        """
+
+        confirmation_dialog = QMessageBox.question(
+            self,
+            "Cancel email",
+            "Are you sure you want to stop sending the current email? The recipients which have not been sent it yet can be sent it the next time you log in.",
+        )
+
+        if confirmation_dialog == QMessageBox.Yes:
+            self.mail_queue.cancel()
+
+    def resume_unfinished_campaigns(self):
+        """
+        Offer to send the interrupted emails of the logged in sender to the recipients which have not received them yet,
+        or to discard them so that they are no longer offered.
+        """
+
+        for campaign_id in self.campaign_journal.unfinished(
+            self.mail_pool.email_address
+        ):
+            campaign = self.campaign_journal.get(campaign_id)
+            counts = self.campaign_journal.counts(campaign_id)
+
+            confirmation_dialog = QMessageBox.question(
+                self,
+                "Resume email",
+                f"The email \"{campaign['subject']}\" was interrupted before it was sent to {counts['pending']} of its recipient(s). Do you want to send it to them now?\n\nChoose No to be asked again the next time you log in, or Discard to never send it to them.",
+                QMessageBox.Yes | QMessageBox.No | QMessageBox.Discard,
+                QMessageBox.Yes,
+            )
+
+            if confirmation_dialog == QMessageBox.Yes:
+                self.send_campaign(campaign_id)
+
+            elif confirmation_dialog == QMessageBox.Discard:
+                self.campaign_journal.cancel(campaign_id)
+
+    def on_campaign_sent(self, result):
+        """
+        Report how the sending of a campaign went, and offer to retry the recipients which could not be sent the email.
+        """
+
+        campaign_id, report = result
+        counts = self.campaign_journal.counts(campaign_id)
+
+        self.send_progress = None
+
+        statistics = f"Sent to {len(report.delivered)} recipient(s) in {len(report.chunks)} message(s) over {report.elapsed:.1f}s ({report.messages_per_second:.2f} messages/s). {counts['sent']} of {sum(counts.values())} recipient(s) of this email have received it."
 
-    def fill_on_spot_registration_event_combo_box(self):
+        # A cancelled email is left pending in the journal, and is offered again the next time the user logs in.
+        if report.cancelled:
+            QMessageBox.information(
+                self,
+                "Email cancelled",
+                f"Sending the email was cancelled.\n\n{statistics} The remaining {counts['pending']} recipient(s) can be sent it the next time you log in.",
+            )
+            return
+
+        failures = self.campaign_journal.failures(campaign_id)
+
+        # If some recipients were not sent the email, list them along with the reason.
+        if failures:
+            failed_recipients = "\n".join(
+                f"{recipient}: {error}" for recipient, error in failures.items()
+            )
+
+            confirmation_dialog = QMessageBox.question(
+                self,
+                "Error sending email",
+                f"{statistics}\n\nThe following recipients could not be sent the email:\n\n{failed_recipients}\n\nDo you want to retry sending it to them?",
+            )
+
+            if confirmation_dialog == QMessageBox.Yes:
+                self.campaign_journal.retry_failed(campaign_id)
+                self.send_campaign(campaign_id)
+
+            return
+
+        QMessageBox.information(
+            self, "Success!", f"Email successfully sent!\n\n{statistics}"
+        )
+
+    def on_send_email_error(self, error):
         """
-        Get the event names from the API and fill the on spot registration event option combo box with the event names.
+        Alert the user that the email could not be sent.
         """
 
-        # Request the API server for the details of all the events.
-        event_details = requests.get(
-            f"{API_URL}/event/", params={"api-key": self.api_key}
-        ).json()
+        self.send_progress = None
+
+        QMessageBox.warning(
+            self, "Error", f"An error occurred while sending the email: {error}"
+        )
+
+    def fill_on_spot_registration_event_combo_box(self, event_names):
+        """
+        Fill the on spot registration event option combo box with the event names.
+        """
 
         # Add each event name as an entry to the combo box.
-        for event in event_details:
-            self.on_spot_registration_event_combo_box.addItem(event["event_name"])
+        self.set_combo_box_items(self.on_spot_registration_event_combo_box, event_names)
 
     def on_spot_registration_register_team(self):
         """
@@ -284,43 +1097,16 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         )
 
         if confirmation_dialog == QMessageBox.Yes:
-            # Request the API server for details of all events
-            event_details = requests.get(
-                f"{API_URL}/event/", params={"api-key": self.api_key}
-            ).json()
-
             # Get the event chosen in the combo box.
             selection = self.on_spot_registration_event_combo_box.currentText()
 
-            # Get the event ID and the maximum participants of the chosen event.
-            for event in event_details:
-                if event["event_name"] == selection:
-                    event_id = event["id"]
-
-            # Create the json body containing team details to be posted to the API server with the information entered by the user.
+            # Create the json body containing team details to be posted to the API server with the information entered by the user. The event ID is looked up in the background.
             team_registration = {
                 "team_school": self.on_spot_registration_team_school_field.text(),
                 "team_event": selection,
-                "event_id": event_id,
             }
 
-            # Create the team by posting the details to the API server.
-            team_created_response = requests.post(
-                f"{API_URL}/team",
-                json=team_registration,
-                params={"api-key": self.api_key},
-            )
-
-            # If the team creation was unsuccessful, notify the user and break out.
-            if team_created_response.status_code != 200:
-                QMessageBox.warning(
-                    self,
-                    "Error registering team",
-                    "There was an error registering the team!",
-                )
-                return
-
-            # Create a list of json bodies containing user details to be posted to the API server with the information entered by the user.
+            # Create a list of json bodies containing user details to be posted to the API server with the information entered by the user. The team ID is added once the team is created.
             users_to_be_registered = [
                 {
                     "user_name": self.on_spot_registration_member_name_field_1.text(),
@@ -328,7 +1114,6 @@ class MainWindow(QMainWindow, Ui_MainWindow):
                     "user_phone": self.on_spot_registration_member_phone_field_1.text(),
                     "user_school": self.on_spot_registration_team_school_field.text(),
                     "user_attendance": True,
-                    "team_id": team_created_response.json()["id"],
                 },
                 {
                     "user_name": self.on_spot_registration_member_name_field_2.text(),
@@ -336,7 +1121,6 @@ class MainWindow(QMainWindow, Ui_MainWindow):
                     "user_phone": self.on_spot_registration_member_phone_field_2.text(),
                     "user_school": self.on_spot_registration_team_school_field.text(),
                     "user_attendance": True,
-                    "team_id": team_created_response.json()["id"],
                 },
                 {
                     "user_name": self.on_spot_registration_member_name_field_3.text(),
@@ -344,7 +1128,6 @@ class MainWindow(QMainWindow, Ui_MainWindow):
                     "user_phone": self.on_spot_registration_member_phone_field_3.text(),
                     "user_school": self.on_spot_registration_team_school_field.text(),
                     "user_attendance": True,
-                    "team_id": team_created_response.json()["id"],
                 },
                 {
                     "user_name": self.on_spot_registration_member_name_field_4.text(),
@@ -352,7 +1135,6 @@ class MainWindow(QMainWindow, Ui_MainWindow):
                     "user_phone": self.on_spot_registration_member_phone_field_4.text(),
                     "user_school": self.on_spot_registration_team_school_field.text(),
                     "user_attendance": True,
-                    "team_id": team_created_response.json()["id"],
                 },
                 {
                     "user_name": self.on_spot_registration_member_name_field_5.text(),
@@ -360,7 +1142,6 @@ class MainWindow(QMainWindow, Ui_MainWindow):
                     "user_phone": self.on_spot_registration_member_phone_field_5.text(),
                     "user_school": self.on_spot_registration_team_school_field.text(),
                     "user_attendance": True,
-                    "team_id": team_created_response.json()["id"],
                 },
                 {
                     "user_name": self.on_spot_registration_member_name_field_6.text(),
@@ -368,7 +1149,6 @@ class MainWindow(QMainWindow, Ui_MainWindow):
                     "user_phone": self.on_spot_registration_member_phone_field_6.text(),
                     "user_school": self.on_spot_registration_team_school_field.text(),
                     "user_attendance": True,
-                    "team_id": team_created_response.json()["id"],
                 },
                 {
                     "user_name": self.on_spot_registration_member_name_field_7.text(),
@@ -376,7 +1156,6 @@ class MainWindow(QMainWindow, Ui_MainWindow):
                     "user_phone": self.on_spot_registration_member_phone_field_7.text(),
                     "user_school": self.on_spot_registration_team_school_field.text(),
                     "user_attendance": True,
-                    "team_id": team_created_response.json()["id"],
                 },
                 {
                     "user_name": self.on_spot_registration_member_name_field_8.text(),
@@ -384,7 +1163,6 @@ class MainWindow(QMainWindow, Ui_MainWindow):
                     "user_phone": self.on_spot_registration_member_phone_field_8.text(),
                     "user_school": self.on_spot_registration_team_school_field.text(),
                     "user_attendance": True,
-                    "team_id": team_created_response.json()["id"],
                 },
             ]
 
@@ -398,18 +1176,140 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
                 valid_users_to_be_registered.append(user)
 
-            # Create each user from the valid_users_to_be_registered list.
-            for user in valid_users_to_be_registered:
-                requests.post(
-                    f"{API_URL}/user/", json=user, params={"api-key": self.api_key}
-                )
-
-            # Notify the user that the team creation was successful.
-            QMessageBox.information(self, "Success!", "Team successfully registered!")
+            # Disable the create team button until the team has been registered.
+            self.on_spot_registration_create_team_button.setEnabled(False)
+
+            self.run_in_background(
+                lambda: self.register_team(
+                    team_registration, valid_users_to_be_registered
+                ),
+                on_result=self.on_team_registered,
+                on_finished=lambda: self.on_spot_registration_create_team_button.setEnabled(
+                    True
+                ),
+                message="Registering team...",
+            )
 
         else:
             pass
 
+    def register_team(self, team_registration, users):
+        """
+        Create the team and its users on the API server, or queue them if the API server cannot be reached. Runs in the background.
+        """
+
+        # Get the event ID of the chosen event from the event cache. Raises RecordNotFound if the event no longer exists.
+        team_registration["event_id"] = self.event_cache.get_event(
+            team_registration["team_event"]
+        ).id
+
+        # Queue the registration behind any changes still waiting to be sent, so that the changes reach the API server in order.
+        if self.write_queue.count():
+            return self.queue_team_registration(team_registration, users)
+
+        # Register the team and its members in a single request, falling back to creating the team, then its members concurrently.
+        use_bulk = self.bulk_registration_supported
+
+        try:
+            result = registration.register_team(
+                self.api,
+                team_registration,
+                users,
+                max_workers=REGISTRATION_MAX_PARALLEL_REQUESTS,
+                use_bulk=use_bulk,
+            )
+
+        except CONNECTION_ERRORS as e:
+            # Queuing a team which reached the API server would register it twice, so only queue it if it was never sent.
+            if isinstance(e, CircuitOpen) or was_not_sent(e):
+                return self.queue_team_registration(team_registration, users)
+
+            return registration.RegistrationResult(unknown=True)
+
+        # Skip the bulk endpoint from now on if the API server does not have it.
+        if use_bulk and not result.bulk:
+            self.bulk_registration_supported = False
+
+        # The event catalogue now has a new team, so the cached copy is out of date.
+        if result.team_created:
+            self.event_cache.invalidate()
+
+        return result
+
+    def queue_team_registration(self, team_registration, users):
+        """
+        Add the team to the local mirror straight away and queue its registration until the API server can be reached.
+        """
+
+        team = self.local_store.add_team(team_registration, users)
+
+        self.write_queue.enqueue(
+            "register_team",
+            {"team": team_registration, "users": users, "local_team_id": team["id"]},
+        )
+
+        # Show the locally added team wherever the event catalogue is read from the mirror.
+        self.event_cache.invalidate()
+
+        return registration.RegistrationResult(
+            team=team, created_members=team["team_members"], queued=True
+        )
+
+    def on_team_registered(self, result):
+        """
+        Notify the user whether the team and each of its members were registered.
+        """
+
+        # If the API server could not be reached, notify the user that the team will be registered later.
+        if result.queued:
+            self.update_offline_label()
+
+            QMessageBox.information(
+                self,
+                "Saved offline",
+                f"The API server could not be reached. The team was saved locally with {len(result.created_members)} member(s) and will be registered once the connection is back.",
+            )
+            return
+
+        # If the connection was lost after the team was sent, the user has to check whether it was registered.
+        if result.unknown:
+            QMessageBox.warning(
+                self,
+                "Registration outcome unknown",
+                "The connection to the API server was lost after the team was sent, so it may or may not have been registered. Please check the team list before registering it again.",
+            )
+            return
+
+        # If the team creation was unsuccessful, notify the user.
+        if not result.team_created:
+            QMessageBox.warning(
+                self,
+                "Error registering team",
+                "There was an error registering the team!",
+            )
+            return
+
+        # If some members could not be created, list them along with the reason.
+        if result.failed_members:
+            failed_members = "\n".join(
+                f"{user['user_name']} ({user['user_email']}): {error}"
+                for user, error in result.failed_members
+            )
+
+            QMessageBox.warning(
+                self,
+                "Error registering members",
+                f"Team {result.team['id']} was registered with {len(result.created_members)} member(s), but the following members could not be registered:\n\n{failed_members}",
+            )
+            return
+
+        # Notify the user that the team creation was successful.
+        QMessageBox.information(
+            self,
+            "Success!",
+            f"Team {result.team['id']} successfully registered with {len(result.created_members)} member(s)!",
+        )
+
     def fill_item(self, item, value):
         """
         Fill the tree widget from the dictionary/list using recursion.
@@ -457,125 +1357,81 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         widget.clear()
         self.fill_item(widget.invisibleRootItem(), value)
 
-    def fill_member_details_combo_box(self):
+    def fill_member_details_combo_box(self, event_names):
         """
-        Get the event names from the API and fill the event member details combo box with the event names.
+        Fill the event member details combo box with the event names.
         """
 
-        # Request the API server for the details of all the events.
-        event_details = requests.get(
-            f"{API_URL}/event/", params={"api-key": self.api_key}
-        ).json()
-
         # Add each event name as an entry to the combo box.
-        for event in event_details:
-            self.event_member_details_combo_box.addItem(event["event_name"])
+        self.set_combo_box_items(self.event_member_details_combo_box, event_names)
 
-    def process_event_member_details(self):
+    def set_combo_box_items(self, combo_box, items):
         """
-        Process the event member details sent by the API server to data usable by the TreeWidget.
+        Replace the entries of the combo box, keeping the current selection if it is still an entry.
         """
 
-        # Get the event chosen in the combo box.
-        selection = self.event_member_details_combo_box.currentText()
-
-        # Retrieve the event details from the API server.
-        event_details = requests.get(
-            f"{API_URL}/event/", params={"api-key": self.api_key}
-        ).json()
+        selection = combo_box.currentText()
 
-        # Get the event data of the chosen event.
-        for event in event_details:
-            if event["event_name"] == selection:
-                event_to_process = event
+        combo_box.clear()
+        combo_box.addItems(items)
 
-        data = []
-
-        # Process the data into TreeWidget readable format.
-        for team in event_to_process["event_teams"]:
-            team_data = [
-                f"Team ID: {team['id']}",
-                f"School: {team['team_school']}",
-            ]
-
-            for member in team["team_members"]:
-                user_data = [
-                    f"User ID: {member['id']}",
-                    f"Name: {member['user_name']}",
-                    f"Email: {member['user_email']}",
-                    f"Phone: {member['user_phone']}",
-                    f"School: {member['user_school']}",
-                    f"Attendance: {member['user_attendance']}",
-                ]
-
-                team_data.append(user_data)
-
-            data.append(team_data)
-
-        # Return the processed data.
-        return data
+        if selection in items:
+            combo_box.setCurrentText(selection)
 
     def refresh_event_member_details_tree(self):
         """
         Refresh the event member details tree.
         """
 
-        # Clear the event member details tree.
-        self.event_member_details_tree.clear()
+        # Get the event chosen in the combo box.
+        selection = self.event_member_details_combo_box.currentText()
+
+        # Drop the cached event catalogue so that the refresh shows the latest details. While the change feed is live, the cache is already up to date and is kept.
+        self.event_cache.invalidate()
 
-        # Fill the event member details tree with the updated information.
-        self.fill_widget(
-            self.event_member_details_tree, self.process_event_member_details()
+        # Get the event data of the chosen event from the event cache in the background. A missing event is reported by show_background_error.
+        self.run_in_background(
+            lambda: self.event_cache.get_event(selection),
+            on_result=self.on_event_member_details_loaded,
+            message="Loading event member details...",
         )
 
-    def process_team_data(self, team_data):
+    def on_event_member_details_loaded(self, event):
         """
-        Process the data into TreeWidget readable format.
+        Show the loaded event in the event member details tree. Rows are only created as they are expanded or scrolled into view.
         """
 
-        processed_team_data = [
-            f"Team ID: {team_data['id']}",
-            f"School: {team_data['team_school']}",
-        ]
-
-        for member in team_data["team_members"]:
-            user_data = [
-                f"User ID: {member['id']}",
-                f"Name: {member['user_name']}",
-                f"Email: {member['user_email']}",
-                f"Phone: {member['user_phone']}",
-                f"School: {member['user_school']}",
-                f"Attendance: {member['user_attendance']}",
-            ]
-
-            processed_team_data.append(user_data)
-
-        # Return the processed team data.
-        return processed_team_data
+        # Only apply what changed since the last refresh, keeping the expanded rows and scroll position.
+        self.event_member_details_model.update_event(event)
 
     def update_details_load_current_team_details(self):
         """
         Fetch the team details from the provided team ID and populate the fields.
         """
-        # Fetch team details.
+        # Fetch team details in the background.
         team_id = int(self.update_details_team_id_field.text())
-        team_details = requests.get(
-            f"{API_URL}/team", params={"team_id": team_id, "api-key": self.api_key}
-        ).json()
+
+        self.run_in_background(
+            lambda: self.load_details("/team", {"team_id": team_id}, Team),
+            on_result=self.on_team_details_loaded,
+            message="Loading team details...",
+        )
+
+    def on_team_details_loaded(self, team):
+        """
+        Populate the team update fields with the loaded team details.
+        """
 
         # Enable the update fields and buttons.
         self.update_details_team_school_field.setEnabled(True)
         self.update_details_update_team_details_button.setEnabled(True)
 
         # Set the text of the update fields to their current value on the server.
-        self.update_details_team_school_field.setText(team_details["team_school"])
+        self.update_details_team_school_field.setText(team.school)
 
         # Set the update team data tree to the current values.
         self.update_details_updated_team_details_tree.clear()
-        self.fill_widget(
-            self.update_details_updated_team_details_tree,
-            self.process_team_data(team_details),
-        )
+        self.fill_widget(self.update_details_updated_team_details_tree, team.lines())
 
     def update_team_details(self):
         """
@@ -589,49 +1445,228 @@ class MainWindow(QMainWindow, Ui_MainWindow):
             "team_school": self.update_details_team_school_field.text(),
         }
 
-        # Make a PUT request to the server to update the team details.
-        updated_team_details = requests.put(
-            f"{API_URL}/team",
-            json=data,
-            params={"team_id": team_id, "api-key": self.api_key},
-        ).json()
+        # Make a PUT request to the server to update the team details in the background.
+        self.run_in_background(
+            lambda: self.put_details("/team", data, {"team_id": team_id}, Team),
+            on_result=self.on_team_details_updated,
+            message="Updating team details...",
+        )
 
-        # Process the updated team details to TreeWidget readable format.
-        processed_team_data = self.process_team_data(updated_team_details)
+    def put_details(self, path, data, params, record):
+        """
+        Update a team or user on the API server and invalidate the event cache, or queue the update if the API server cannot be reached. Runs in the background.
+        Returns the updated details parsed into the given record type, and whether the update was queued.
+        """
 
-        # Update the tree with the processed team data.
-        self.update_details_updated_team_details_tree.clear()
-        self.fill_widget(
-            self.update_details_updated_team_details_tree, processed_team_data
+        updated_details, queued = self.put_raw_details(path, data, params)
+
+        if updated_details is None:
+            return None, queued
+
+        return record.from_json(updated_details), queued
+
+    def put_raw_details(self, path, data, params):
+        """
+        Update a team or user and return the JSON of the updated details, or None if they are not in the local mirror, and whether the update was queued.
+        """
+
+        # Queue the update behind any changes still waiting to be sent, so that the changes reach the API server in order.
+        if self.write_queue.count():
+            return self.queue_update(path, data, params), True
+
+        try:
+            response = self.api.put(path, json=data, params=params)
+
+        except CONNECTION_ERRORS:
+            return self.queue_update(path, data, params), True
+
+        updated_details = self.read_details(response, params)
+
+        # The cached event catalogue no longer matches the server.
+        self.event_cache.invalidate()
+
+        return updated_details, False
+
+    def queue_update(self, path, data, params):
+        """
+        Apply the update to the local mirror straight away and queue it until the API server can be reached.
+        Returns the updated details from the mirror, or None if they are not in the mirror.
+        """
+
+        # A team or user registered while offline only has a local ID, so the update goes into its queued registration.
+        if not self.merge_into_queued_registration(data, params):
+            self.write_queue.enqueue(
+                "update", {"path": path, "data": data, "params": params}
+            )
+
+        self.event_cache.invalidate()
+
+        if "team_id" in params:
+            self.local_store.update_team(params["team_id"], data)
+
+            return self.local_store.load_team(params["team_id"])
+
+        self.local_store.update_user(params["user_id"], data)
+
+        return self.local_store.find_user(params["user_id"])
+
+    def merge_into_queued_registration(self, data, params):
+        """
+        Apply an update of a team or user with a negative, local ID to the queued registration of its team, as the API
+        server does not know that ID. Returns whether the update was merged.
+        """
+
+        local_id = params.get("team_id", params.get("user_id"))
+
+        if local_id >= 0:
+            return False
+
+        if "team_id" in params:
+            local_team_id = local_id
+
+        else:
+            user = self.local_store.find_user(local_id)
+
+            if user is None:
+                return False
+
+            local_team_id = user["team_id"]
+
+        for write in self.write_queue.pending():
+            payload = write["payload"]
+
+            if (
+                write["kind"] != "register_team"
+                or payload["local_team_id"] != local_team_id
+            ):
+                continue
+
+            if "team_id" in params:
+                payload["team"].update(data)
+
+            else:
+                # The members were given consecutive negative IDs in the order of the registration, starting from the highest.
+                member_ids = [
+                    member["id"]
+                    for member in self.local_store.load_team(local_team_id)[
+                        "team_members"
+                    ]
+                ]
+                payload["users"][max(member_ids) - local_id].update(data)
+
+            return self.write_queue.update_payload(write["id"], payload)
+
+        return False
+
+    def notify_update_queued(self):
+        """
+        Notify the user that an update will be sent once the API server can be reached.
+        """
+
+        self.update_offline_label()
+
+        QMessageBox.information(
+            self,
+            "Saved offline",
+            "The API server could not be reached. The changes were saved locally and will be sent once the connection is back.",
+        )
+
+    def load_details(self, path, params, record):
+        """
+        Get a team or user from the API server, or from the local mirror if the API server cannot be reached, parsed into the given record type. Runs in the background.
+        """
+
+        return record.from_json(self.load_raw_details(path, params))
+
+    def load_raw_details(self, path, params):
+        """
+        Get the JSON of a team or user from the API server, or from the local mirror if the API server cannot be reached.
+        """
+
+        try:
+            # Details which have not changed since they were last read are served from the API client's cache.
+            response = self.api.get(path, params=params, conditional=True)
+
+        except CONNECTION_ERRORS:
+            details = (
+                self.local_store.load_team(params["team_id"])
+                if "team_id" in params
+                else self.local_store.find_user(params["user_id"])
+            )
+
+            if details is None:
+                raise
+
+            return details
+
+        return self.read_details(response, params)
+
+    def read_details(self, response, params):
+        """
+        Get the JSON of a team or user from a response of the API server.
+        Raises RecordNotFound if there is no such team or user, and ClientError if the API server rejected the request.
+        """
+
+        kind, record_id = (
+            ("team", params["team_id"])
+            if "team_id" in params
+            else ("user", params["user_id"])
         )
 
+        if response.status_code == 404:
+            raise RecordNotFound(f"There is no {kind} with ID {record_id}.")
+
+        # Report the status without the request URL, which contains the API key.
+        if response.status_code >= 400:
+            raise ClientError(
+                f"The API server rejected the request for {kind} {record_id}: {response.status_code} {response.reason}",
+                response=response,
+            )
+
+        return response.json()
+
+    def on_team_details_updated(self, result):
+        """
+        Show the updated team details.
+        """
+
+        team, queued = result
+
+        if queued:
+            self.notify_update_queued()
+
+        # Update the tree with the processed team data, unless the team is not in the local mirror.
+        self.update_details_updated_team_details_tree.clear()
+
+        if team is not None:
+            self.fill_widget(
+                self.update_details_updated_team_details_tree, team.lines()
+            )
+
         # Disable the input fields to prevent misclicks.
         self.update_details_team_school_field.setEnabled(False)
         self.update_details_update_team_details_button.setEnabled(False)
 
         self.update_details_team_id_field.setText("")
 
-    def process_user_data(self, user_data):
-        # Process the data into TreeWidget readable format and return it.
-        return [
-            f"User ID: {user_data['id']}",
-            f"Name: {user_data['user_name']}",
-            f"Email: {user_data['user_email']}",
-            f"Phone: {user_data['user_phone']}",
-            f"School: {user_data['user_school']}",
-            f"Attendance: {user_data['user_attendance']}",
-        ]
-
     def update_details_load_current_user_details(self):
         """
         Fetch the user details from the provided user ID and populate the fields.
         """
 
-        # Fetch user details.
+        # Fetch user details in the background.
         user_id = int(self.update_details_user_id_field.text())
-        user_details = requests.get(
-            f"{API_URL}/user", params={"user_id": user_id, "api-key": self.api_key}
-        ).json()
+
+        self.run_in_background(
+            lambda: self.load_details("/user", {"user_id": user_id}, User),
+            on_result=self.on_user_details_loaded,
+            message="Loading user details...",
+        )
+
+    def on_user_details_loaded(self, user):
+        """
+        Populate the user update fields with the loaded user details.
+        """
 
         # Enable the update fields and buttons.
         self.update_details_user_name_field.setEnabled(True)
@@ -641,20 +1676,15 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.update_details_update_user_details_button.setEnabled(True)
 
         # Set the text of the update fields to their current value on the server.
-        self.update_details_user_name_field.setText(user_details["user_name"])
-        self.update_details_user_email_field.setText(user_details["user_email"])
-        self.update_details_user_phone_field.setText(user_details["user_phone"])
+        self.update_details_user_name_field.setText(user.name)
+        self.update_details_user_email_field.setText(user.email)
+        self.update_details_user_phone_field.setText(user.phone)
 
-        self.update_details_user_attendance_check_box.setChecked(
-            user_details["user_attendance"]
-        )
+        self.update_details_user_attendance_check_box.setChecked(user.attendance)
 
         # Set the update user data tree to the current values.
         self.update_details_updated_user_details_tree.clear()
-        self.fill_widget(
-            self.update_details_updated_user_details_tree,
-            self.process_user_data(user_details),
-        )
+        self.fill_widget(self.update_details_updated_user_details_tree, user.lines())
 
     def update_user_details(self):
         """
@@ -671,21 +1701,30 @@ class MainWindow(QMainWindow, Ui_MainWindow):
             "user_attendance": self.update_details_user_attendance_check_box.isChecked(),
         }
 
-        # Make a PUT request to the server to update the user details.
-        updated_user_details = requests.put(
-            f"{API_URL}/user",
-            json=data,
-            params={"user_id": user_id, "api-key": self.api_key},
-        ).json()
+        # Make a PUT request to the server to update the user details in the background.
+        self.run_in_background(
+            lambda: self.put_details("/user", data, {"user_id": user_id}, User),
+            on_result=self.on_user_details_updated,
+            message="Updating user details...",
+        )
 
-        # Process the updated user details to TreeWidget readable format.
-        processed_user_data = self.process_user_data(updated_user_details)
+    def on_user_details_updated(self, result):
+        """
+        Show the updated user details.
+        """
 
-        # Update the tree with the processed user data.
+        user, queued = result
+
+        if queued:
+            self.notify_update_queued()
+
+        # Update the tree with the processed user data, unless the user is not in the local mirror.
         self.update_details_updated_user_details_tree.clear()
-        self.fill_widget(
-            self.update_details_updated_user_details_tree, processed_user_data
-        )
+
+        if user is not None:
+            self.fill_widget(
+                self.update_details_updated_user_details_tree, user.lines()
+            )
 
         # Disable the input fields to prevent misclicks.
         self.update_details_user_name_field.setEnabled(False)
@@ -696,6 +1735,33 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
         self.update_details_user_id_field.setText("")
 
+    def closeEvent(self, event):
+        """
+        Release the pooled API and mailing server connections when the window is closed.
+        """
+
+        # Stop replaying the queued writes, which would otherwise read the local store after it is closed.
+        self.replay_timer.stop()
+
+        # Drop queued background tasks and wait for the running ones before closing the connections.
+        self.thread_pool.clear()
+        self.thread_pool.waitForDone()
+
+        # An open stream is interrupted straight away, while a pending long-poll request is waited for.
+        self.change_feed.stop()
+        self.change_feed_thread_pool.waitForDone()
+
+        # Stop sending emails. The unsent recipients stay pending in the campaign journal and are offered again at the next login.
+        self.mail_queue.shutdown()
+
+        self.api.close()
+        self.local_store.close()
+
+        if self.mail_pool is not None:
+            self.mail_pool.close()
+
+        super().closeEvent(event)
+
 
 app = QApplication([])
 app.setStyle("Fusion")
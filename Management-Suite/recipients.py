@@ -0,0 +1,68 @@
+from dataclasses import dataclass, field
+
+# Whether recipients must be registered for any or every one of the chosen events.
+MATCH_ANY = "any"
+MATCH_ALL = "all"
+
+
+def normalise_email(email):
+    """
+    Get the form of an email address used to tell whether two registrations belong to the same person.
+    """
+
+    return email.strip().lower()
+
+
+@dataclass
+class RecipientResolution:
+    """
+    The deduplicated recipients of an email, with counts of how they were chosen.
+    """
+
+    recipients: list = field(default_factory=list)
+
+    # Number of registrations for the chosen events, and how many of them belonged to someone already counted.
+    registrations: int = 0
+    duplicates: int = 0
+
+
+def resolve_recipients(events, event_names=None, match=MATCH_ANY, attendance=None):
+    """
+    Get the recipients registered for the chosen events in a single pass over the event catalogue, keeping one entry per
+    person. If no events are chosen, every participant is a recipient. Attendance, if given, keeps only the recipients
+    who did or did not attend.
+    """
+
+    chosen = set(event_names or ())
+
+    # Normalised address of each recipient, mapped to the address as it was first registered and the chosen events it was registered for.
+    matches = {}
+    resolution = RecipientResolution()
+
+    for event in events:
+        if chosen and event.name not in chosen:
+            continue
+
+        for _, user in event.members():
+            if attendance is not None and user.attendance != attendance:
+                continue
+
+            resolution.registrations += 1
+
+            email = normalise_email(user.email)
+
+            if email not in matches:
+                matches[email] = (user.email.strip(), set())
+
+            matches[email][1].add(event.name)
+
+    resolution.duplicates = resolution.registrations - len(matches)
+
+    # In the intersection, a recipient must be registered for every chosen event.
+    resolution.recipients = [
+        email
+        for email, events_registered in matches.values()
+        if match == MATCH_ANY or not chosen or events_registered >= chosen
+    ]
+
+    return resolution
@@ -0,0 +1,113 @@
+from dataclasses import dataclass, field
+
+
+@dataclass(slots=True)
+class User:
+    """
+    A participant of an event, parsed once from the JSON returned by the API server.
+    """
+
+    id: int
+    name: str
+    email: str
+    phone: str
+    school: str
+    attendance: bool
+    team_id: int | None = None
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(
+            data["id"],
+            data["user_name"],
+            data["user_email"],
+            data["user_phone"],
+            data["user_school"],
+            bool(data["user_attendance"]),
+            data.get("team_id"),
+        )
+
+    def fields(self):
+        """
+        Get the label and value of each detail shown under the user.
+        """
+
+        return [
+            ("Name", self.name),
+            ("Email", self.email),
+            ("Phone", self.phone),
+            ("School", self.school),
+            ("Attendance", self.attendance),
+        ]
+
+    def lines(self):
+        """
+        Get the details of the user as the lines shown in the details trees.
+        """
+
+        return [
+            f"User ID: {self.id}",
+            *(f"{label}: {value}" for label, value in self.fields()),
+        ]
+
+
+@dataclass(slots=True)
+class Team:
+    """
+    A team registered for an event, along with its members.
+    """
+
+    id: int
+    school: str
+    event_name: str | None = None
+    event_id: int | None = None
+    members: list = field(default_factory=list)
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(
+            data["id"],
+            data["team_school"],
+            data.get("team_event"),
+            data.get("event_id"),
+            [User.from_json(member) for member in data.get("team_members", ())],
+        )
+
+    def lines(self):
+        """
+        Get the details of the team as the lines shown in the details trees, with a nested list for each member.
+        """
+
+        return [
+            f"Team ID: {self.id}",
+            f"School: {self.school}",
+            *(member.lines() for member in self.members),
+        ]
+
+
+@dataclass(slots=True)
+class Event:
+    """
+    An event, along with the teams registered for it.
+    """
+
+    id: int
+    name: str
+    teams: list = field(default_factory=list)
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(
+            data["id"],
+            data["event_name"],
+            [Team.from_json(team) for team in data["event_teams"]],
+        )
+
+    def members(self):
+        """
+        Iterate over the team and user of every participant of the event.
+        """
+
+        for team in self.teams:
+            for user in team.members:
+                yield team, user
@@ -0,0 +1,130 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import requests
+
+# Maximum number of members created on the API server at the same time.
+MAX_PARALLEL_MEMBER_REQUESTS = 8
+
+# Status codes returned by API servers which do not have the bulk team registration endpoint.
+BULK_REGISTRATION_UNSUPPORTED_STATUSES = (404, 405)
+
+
+@dataclass
+class RegistrationResult:
+    """
+    Outcome of registering a team, with the members that were and were not created.
+    """
+
+    team: dict | None = None
+    created_members: list = field(default_factory=list)
+    failed_members: list = field(default_factory=list)
+
+    # Whether the team was registered atomically through the bulk endpoint.
+    bulk: bool = False
+
+    # Whether the API server could not be reached, so the registration was queued to be sent later.
+    queued: bool = False
+
+    # Whether the connection was lost after the team was sent, so the API server may or may not have registered it.
+    unknown: bool = False
+
+    @property
+    def team_created(self):
+        return self.team is not None
+
+
+def create_member(api, user):
+    """
+    Create a single member on the API server, returning the created user or raising on failure.
+    """
+
+    response = api.post("/user/", json=user)
+
+    # Report the status without the request URL, which contains the API key.
+    if response.status_code != 200:
+        raise requests.HTTPError(
+            f"{response.status_code} {response.reason}", response=response
+        )
+
+    return response.json()
+
+
+def create_members(
+    api, team_id, users, result, max_workers=MAX_PARALLEL_MEMBER_REQUESTS
+):
+    """
+    Create the members of a team concurrently and record the outcome of each one in the result.
+    """
+
+    if not users:
+        return result
+
+    users = [{**user, "team_id": team_id} for user in users]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(users))) as executor:
+        futures = [executor.submit(create_member, api, user) for user in users]
+
+        # Collect the outcomes in the order the members were entered.
+        for user, future in zip(users, futures):
+            try:
+                result.created_members.append(future.result())
+
+            except Exception as e:
+                result.failed_members.append((user, e))
+
+    return result
+
+
+def register_team_bulk(api, team_registration, users):
+    """
+    Create the team along with all of its members in a single request, or return None if the API server does not support it.
+    """
+
+    # The server creates the team and its members atomically, so either all of them are registered or none are.
+    response = api.post("/team/bulk", json={**team_registration, "team_members": users})
+
+    if response.status_code in BULK_REGISTRATION_UNSUPPORTED_STATUSES:
+        return None
+
+    result = RegistrationResult(bulk=True)
+
+    if response.status_code != 200:
+        return result
+
+    result.team = response.json()
+    result.created_members = result.team["team_members"]
+
+    return result
+
+
+def register_team(
+    api,
+    team_registration,
+    users,
+    max_workers=MAX_PARALLEL_MEMBER_REQUESTS,
+    use_bulk=True,
+):
+    """
+    Register the team and its members, in a single request if the API server supports it.
+    Otherwise, create the team, then create all of its members concurrently.
+    """
+
+    if use_bulk:
+        result = register_team_bulk(api, team_registration, users)
+
+        if result is not None:
+            return result
+
+    result = RegistrationResult()
+
+    # Create the team by posting the details to the API server.
+    team_created_response = api.post("/team", json=team_registration)
+
+    # If the team creation was unsuccessful, there are no members to create.
+    if team_created_response.status_code != 200:
+        return result
+
+    result.team = team_created_response.json()
+
+    return create_members(api, result.team["id"], users, result, max_workers)
@@ -0,0 +1,240 @@
+import smtplib
+import ssl
+import threading
+import time
+from contextlib import contextmanager
+
+# Default mailing server used by the mailing list.
+DEFAULT_HOST = "smtp.office365.com"
+DEFAULT_PORT = 587
+
+# Default number of authenticated connections kept open to the mailing server at the same time.
+DEFAULT_POOL_SIZE = 4
+
+# Default number of seconds to wait for the mailing server before giving up on a command.
+DEFAULT_TIMEOUT = 30
+
+# Number of seconds a connection can sit idle before it is checked with a NOOP before being reused.
+HEALTH_CHECK_INTERVAL = 30
+
+# Errors raised when a connection to the mailing server was dropped.
+DISCONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+def send_transaction(smtp, from_addr, to_addrs, data):
+    """
+    Send an already serialised message with the MAIL, RCPT and DATA commands, as smtplib.SMTP.sendmail does, but also
+    return the reply of the server to DATA, which usually carries the ID it queued the message under.
+    Returns the recipients which were refused, and the (code, message) reply to DATA.
+    """
+
+    smtp.ehlo_or_helo_if_needed()
+
+    code, reply = smtp.mail(from_addr)
+
+    if code != 250:
+        raise smtplib.SMTPSenderRefused(code, reply, from_addr)
+
+    refused = {}
+
+    for recipient in to_addrs:
+        code, reply = smtp.rcpt(recipient)
+
+        if code not in (250, 251):
+            refused[recipient] = (code, reply)
+
+    if len(refused) == len(to_addrs):
+        raise smtplib.SMTPRecipientsRefused(refused)
+
+    code, reply = smtp.data(data)
+
+    if code != 250:
+        raise smtplib.SMTPDataError(code, reply)
+
+    return refused, (code, reply)
+
+
+class SMTPConnectionPool:
+    """
+    Pool of authenticated STARTTLS connections to the mailing server, which are reused between sends and reconnected
+    whenever the server has dropped them.
+    """
+
+    def __init__(
+        self,
+        email_address,
+        password,
+        host=DEFAULT_HOST,
+        port=DEFAULT_PORT,
+        size=DEFAULT_POOL_SIZE,
+        timeout=DEFAULT_TIMEOUT,
+    ):
+        self.email_address = email_address
+        self.password = password
+        self.host = host
+        self.port = port
+        self.size = size
+        self.timeout = timeout
+
+        # Idle connections along with the time they were last used, most recently used last.
+        self._idle = []
+        self._lock = threading.Lock()
+
+        # Limit the number of connections open at the same time.
+        self._slots = threading.BoundedSemaphore(size)
+
+        self._tls_context = ssl.create_default_context()
+
+        # Whether the mailing server has accepted the credentials during this session.
+        self.verified = False
+
+    def connect(self):
+        """
+        Open a new connection to the mailing server, upgrade it with STARTTLS and log in.
+        """
+
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+
+        try:
+            smtp.ehlo()
+            smtp.starttls(context=self._tls_context)
+            smtp.ehlo()
+            smtp.login(self.email_address, self.password)
+
+        except Exception:
+            self.discard(smtp)
+            raise
+
+        self.verified = True
+
+        return smtp
+
+    def verify(self):
+        """
+        Check the credentials with an AUTH handshake, without sending a message. Once the credentials have been accepted,
+        they are not checked again, and the authenticated connection is kept in the pool for the first send.
+        """
+
+        if self.verified:
+            return
+
+        with self.connection():
+            pass
+
+    def is_healthy(self, smtp, last_used):
+        """
+        Check whether an idle connection can still be used. Connections idle for a while are checked with a NOOP.
+        """
+
+        if time.monotonic() - last_used < HEALTH_CHECK_INTERVAL:
+            return True
+
+        try:
+            return smtp.noop()[0] == 250
+
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def checkout(self):
+        """
+        Take a healthy idle connection, or open a new one if there is none.
+        """
+
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+
+                smtp, last_used = self._idle.pop()
+
+            if self.is_healthy(smtp, last_used):
+                return smtp
+
+            self.discard(smtp)
+
+        return self.connect()
+
+    def checkin(self, smtp):
+        """
+        Return a connection to the pool so that the next send can reuse it.
+        """
+
+        with self._lock:
+            self._idle.append((smtp, time.monotonic()))
+
+    def discard(self, smtp):
+        """
+        Close a connection which cannot be reused.
+        """
+
+        try:
+            smtp.quit()
+
+        except (smtplib.SMTPException, OSError):
+            smtp.close()
+
+    @contextmanager
+    def connection(self, fresh=False):
+        """
+        Borrow an authenticated connection, waiting for one if every connection is in use.
+        If fresh is set, a new connection is opened instead of reusing an idle one.
+        """
+
+        with self._slots:
+            smtp = self.connect() if fresh else self.checkout()
+
+            try:
+                yield smtp
+
+            except DISCONNECTION_ERRORS:
+                self.discard(smtp)
+                raise
+
+            except BaseException:
+                # The connection may be in the middle of a transaction, so reset it before it is reused.
+                try:
+                    smtp.rset()
+
+                except (smtplib.SMTPException, OSError):
+                    self.discard(smtp)
+
+                else:
+                    self.checkin(smtp)
+
+                raise
+
+            else:
+                self.checkin(smtp)
+
+    def run(self, fn):
+        """
+        Call the function with a pooled connection, calling it again over a fresh connection if the server dropped the connection.
+        """
+
+        try:
+            with self.connection() as smtp:
+                return fn(smtp)
+
+        except DISCONNECTION_ERRORS:
+            # The connection went stale since it was checked, so try again over a fresh one.
+            with self.connection(fresh=True) as smtp:
+                return fn(smtp)
+
+    def sendmail(self, from_addr, to_addrs, data):
+        """
+        Send an already serialised message over a pooled connection.
+        Returns the recipients which were refused, and the (code, message) reply of the server to DATA.
+        """
+
+        return self.run(lambda smtp: send_transaction(smtp, from_addr, to_addrs, data))
+
+    def close(self):
+        """
+        Close every idle connection.
+        """
+
+        with self._lock:
+            idle, self._idle = self._idle, []
+
+        for smtp, _ in idle:
+            self.discard(smtp)
@@ -18,8 +18,9 @@ from PySide6.QtGui import (QAction, QBrush, QColor, QConicalGradient,
     QTransform)
 from PySide6.QtWidgets import (QApplication, QCheckBox, QComboBox, QFrame,
     QGridLayout, QHBoxLayout, QHeaderView, QLabel,
-    QLineEdit, QMainWindow, QPushButton, QSizePolicy,
-    QSpacerItem, QTabWidget, QTextEdit, QTreeWidget,
+    QLineEdit, QListWidget, QListWidgetItem, QMainWindow,
+    QProgressBar, QPushButton, QSizePolicy, QSpacerItem,
+    QTabWidget, QTextEdit, QTreeView, QTreeWidget,
     QTreeWidgetItem, QVBoxLayout, QWidget)
 
 class Ui_MainWindow(object):
@@ -132,15 +133,48 @@ class Ui_MainWindow(object):
 
         self.horizontalLayout_4.addWidget(self.mailing_list_recipients_label)
 
-        self.mailing_list_recipients_combo_box = QComboBox(self.mailing_list_tab)
-        self.mailing_list_recipients_combo_box.setObjectName(u"mailing_list_recipients_combo_box")
-        self.mailing_list_recipients_combo_box.setEnabled(False)
+        self.mailing_list_recipients_list = QListWidget(self.mailing_list_tab)
+        self.mailing_list_recipients_list.setObjectName(u"mailing_list_recipients_list")
+        self.mailing_list_recipients_list.setEnabled(False)
+        self.mailing_list_recipients_list.setMaximumSize(QSize(16777215, 100))
 
-        self.horizontalLayout_4.addWidget(self.mailing_list_recipients_combo_box)
+        self.horizontalLayout_4.addWidget(self.mailing_list_recipients_list)
 
 
         self.verticalLayout_2.addLayout(self.horizontalLayout_4)
 
+        self.horizontalLayout_31 = QHBoxLayout()
+        self.horizontalLayout_31.setObjectName(u"horizontalLayout_31")
+        self.mailing_list_recipients_match_label = QLabel(self.mailing_list_tab)
+        self.mailing_list_recipients_match_label.setObjectName(u"mailing_list_recipients_match_label")
+
+        self.horizontalLayout_31.addWidget(self.mailing_list_recipients_match_label)
+
+        self.mailing_list_recipients_match_combo_box = QComboBox(self.mailing_list_tab)
+        self.mailing_list_recipients_match_combo_box.addItem("")
+        self.mailing_list_recipients_match_combo_box.addItem("")
+        self.mailing_list_recipients_match_combo_box.setObjectName(u"mailing_list_recipients_match_combo_box")
+        self.mailing_list_recipients_match_combo_box.setEnabled(False)
+
+        self.horizontalLayout_31.addWidget(self.mailing_list_recipients_match_combo_box)
+
+        self.mailing_list_attendance_label = QLabel(self.mailing_list_tab)
+        self.mailing_list_attendance_label.setObjectName(u"mailing_list_attendance_label")
+
+        self.horizontalLayout_31.addWidget(self.mailing_list_attendance_label)
+
+        self.mailing_list_attendance_combo_box = QComboBox(self.mailing_list_tab)
+        self.mailing_list_attendance_combo_box.addItem("")
+        self.mailing_list_attendance_combo_box.addItem("")
+        self.mailing_list_attendance_combo_box.addItem("")
+        self.mailing_list_attendance_combo_box.setObjectName(u"mailing_list_attendance_combo_box")
+        self.mailing_list_attendance_combo_box.setEnabled(False)
+
+        self.horizontalLayout_31.addWidget(self.mailing_list_attendance_combo_box)
+
+
+        self.verticalLayout_2.addLayout(self.horizontalLayout_31)
+
         self.horizontalLayout_5 = QHBoxLayout()
         self.horizontalLayout_5.setObjectName(u"horizontalLayout_5")
         self.mailing_list_subject_label = QLabel(self.mailing_list_tab)
@@ -185,6 +219,12 @@ class Ui_MainWindow(object):
 
         self.horizontalLayout_7.addWidget(self.mailing_list_add_attachments_button)
 
+        self.mailing_list_personalise_check_box = QCheckBox(self.mailing_list_tab)
+        self.mailing_list_personalise_check_box.setObjectName(u"mailing_list_personalise_check_box")
+        self.mailing_list_personalise_check_box.setEnabled(False)
+
+        self.horizontalLayout_7.addWidget(self.mailing_list_personalise_check_box)
+
         self.horizontalSpacer_7 = QSpacerItem(40, 20, QSizePolicy.Expanding, QSizePolicy.Minimum)
 
         self.horizontalLayout_7.addItem(self.horizontalSpacer_7)
@@ -218,6 +258,35 @@ class Ui_MainWindow(object):
 
         self.verticalLayout_2.addLayout(self.horizontalLayout_8)
 
+        self.horizontalLayout_32 = QHBoxLayout()
+        self.horizontalLayout_32.setObjectName(u"horizontalLayout_32")
+        self.mailing_list_send_progress_bar = QProgressBar(self.mailing_list_tab)
+        self.mailing_list_send_progress_bar.setObjectName(u"mailing_list_send_progress_bar")
+        self.mailing_list_send_progress_bar.setEnabled(False)
+        self.mailing_list_send_progress_bar.setValue(0)
+
+        self.horizontalLayout_32.addWidget(self.mailing_list_send_progress_bar)
+
+        self.mailing_list_send_progress_label = QLabel(self.mailing_list_tab)
+        self.mailing_list_send_progress_label.setObjectName(u"mailing_list_send_progress_label")
+
+        self.horizontalLayout_32.addWidget(self.mailing_list_send_progress_label)
+
+        self.mailing_list_pause_button = QPushButton(self.mailing_list_tab)
+        self.mailing_list_pause_button.setObjectName(u"mailing_list_pause_button")
+        self.mailing_list_pause_button.setEnabled(False)
+
+        self.horizontalLayout_32.addWidget(self.mailing_list_pause_button)
+
+        self.mailing_list_cancel_button = QPushButton(self.mailing_list_tab)
+        self.mailing_list_cancel_button.setObjectName(u"mailing_list_cancel_button")
+        self.mailing_list_cancel_button.setEnabled(False)
+
+        self.horizontalLayout_32.addWidget(self.mailing_list_cancel_button)
+
+
+        self.verticalLayout_2.addLayout(self.horizontalLayout_32)
+
 
         self.verticalLayout_6.addLayout(self.verticalLayout_2)
 
@@ -663,11 +732,10 @@ class Ui_MainWindow(object):
 
         self.verticalLayout_7.addLayout(self.horizontalLayout_18)
 
-        self.event_member_details_tree = QTreeWidget(self.event_member_details_tab)
-        __qtreewidgetitem = QTreeWidgetItem()
-        __qtreewidgetitem.setText(0, u"1");
-        self.event_member_details_tree.setHeaderItem(__qtreewidgetitem)
+        self.event_member_details_tree = QTreeView(self.event_member_details_tab)
         self.event_member_details_tree.setObjectName(u"event_member_details_tree")
+        self.event_member_details_tree.setUniformRowHeights(True)
+        self.event_member_details_tree.header().setVisible(False)
 
         self.verticalLayout_7.addWidget(self.event_member_details_tree)
 
@@ -775,9 +843,9 @@ class Ui_MainWindow(object):
         self.verticalLayout_4.addWidget(self.update_details_updated_team_details_display_label)
 
         self.update_details_updated_team_details_tree = QTreeWidget(self.update_details_tab)
-        __qtreewidgetitem1 = QTreeWidgetItem()
-        __qtreewidgetitem1.setText(0, u"1");
-        self.update_details_updated_team_details_tree.setHeaderItem(__qtreewidgetitem1)
+        __qtreewidgetitem = QTreeWidgetItem()
+        __qtreewidgetitem.setText(0, u"1");
+        self.update_details_updated_team_details_tree.setHeaderItem(__qtreewidgetitem)
         self.update_details_updated_team_details_tree.setObjectName(u"update_details_updated_team_details_tree")
 
         self.verticalLayout_4.addWidget(self.update_details_updated_team_details_tree)
@@ -916,9 +984,9 @@ class Ui_MainWindow(object):
         self.verticalLayout_5.addWidget(self.update_details_updated_user_details_display_label)
 
         self.update_details_updated_user_details_tree = QTreeWidget(self.update_details_tab)
-        __qtreewidgetitem2 = QTreeWidgetItem()
-        __qtreewidgetitem2.setText(0, u"1");
-        self.update_details_updated_user_details_tree.setHeaderItem(__qtreewidgetitem2)
+        __qtreewidgetitem1 = QTreeWidgetItem()
+        __qtreewidgetitem1.setText(0, u"1");
+        self.update_details_updated_user_details_tree.setHeaderItem(__qtreewidgetitem1)
         self.update_details_updated_user_details_tree.setObjectName(u"update_details_updated_user_details_tree")
 
         self.verticalLayout_5.addWidget(self.update_details_updated_user_details_tree)
@@ -988,11 +1056,33 @@ class Ui_MainWindow(object):
         self.mailing_list_email_password_label.setText(QCoreApplication.translate("MainWindow", u"Email Password:", None))
         self.mailing_list_email_login_button.setText(QCoreApplication.translate("MainWindow", u"Login", None))
         self.mailing_list_recipients_label.setText(QCoreApplication.translate("MainWindow", u"Recipients:", None))
+#if QT_CONFIG(tooltip)
+        self.mailing_list_recipients_list.setToolTip(QCoreApplication.translate("MainWindow", u"Check the events whose participants should receive the email. If no event is checked, every participant receives it.", None))
+#endif // QT_CONFIG(tooltip)
+        self.mailing_list_recipients_match_label.setText(QCoreApplication.translate("MainWindow", u"Participants of:", None))
+        self.mailing_list_recipients_match_combo_box.setItemText(0, QCoreApplication.translate("MainWindow", u"Any checked event", None))
+        self.mailing_list_recipients_match_combo_box.setItemText(1, QCoreApplication.translate("MainWindow", u"Every checked event", None))
+
+        self.mailing_list_attendance_label.setText(QCoreApplication.translate("MainWindow", u"Attendance:", None))
+        self.mailing_list_attendance_combo_box.setItemText(0, QCoreApplication.translate("MainWindow", u"Everyone", None))
+        self.mailing_list_attendance_combo_box.setItemText(1, QCoreApplication.translate("MainWindow", u"Attended", None))
+        self.mailing_list_attendance_combo_box.setItemText(2, QCoreApplication.translate("MainWindow", u"Did not attend", None))
+
         self.mailing_list_subject_label.setText(QCoreApplication.translate("MainWindow", u"Subject:", None))
         self.mailing_list_mail_body_label.setText(QCoreApplication.translate("MainWindow", u"Mail Body:", None))
         self.attachments_label.setText(QCoreApplication.translate("MainWindow", u"Attachments:", None))
         self.mailing_list_add_attachments_button.setText(QCoreApplication.translate("MainWindow", u"Add Attachments", None))
+#if QT_CONFIG(tooltip)
+        self.mailing_list_personalise_check_box.setToolTip(QCoreApplication.translate("MainWindow", u"Replace {name}, {email}, {phone}, {school}, {team_id} and {event} in the subject and body with the details of each recipient.", None))
+#endif // QT_CONFIG(tooltip)
+        self.mailing_list_personalise_check_box.setText(QCoreApplication.translate("MainWindow", u"Personalise", None))
         self.mailing_list_send_email_button.setText(QCoreApplication.translate("MainWindow", u"Send Email", None))
+        self.mailing_list_send_progress_label.setText(QCoreApplication.translate("MainWindow", u"No emails are being sent.", None))
+        self.mailing_list_pause_button.setText(QCoreApplication.translate("MainWindow", u"Pause", None))
+#if QT_CONFIG(tooltip)
+        self.mailing_list_cancel_button.setToolTip(QCoreApplication.translate("MainWindow", u"Stop sending the current email. The recipients which have not been sent it yet can be sent it later.", None))
+#endif // QT_CONFIG(tooltip)
+        self.mailing_list_cancel_button.setText(QCoreApplication.translate("MainWindow", u"Cancel", None))
         self.main_window_tabs.setTabText(self.main_window_tabs.indexOf(self.mailing_list_tab), QCoreApplication.translate("MainWindow", u"Mailing List", None))
         self.on_spot_registration_team_school_label.setText(QCoreApplication.translate("MainWindow", u"Team School:", None))
         self.on_spot_registration_event_label.setText(QCoreApplication.translate("MainWindow", u"Event:", None))
@@ -0,0 +1,49 @@
+from PySide6.QtCore import QObject, QRunnable, Signal, Slot
+
+
+class WorkerSignals(QObject):
+    """
+    Signals used by a Worker to deliver its outcome back to the GUI thread.
+    """
+
+    # Emitted with the return value of the function when it completes successfully.
+    result = Signal(object)
+
+    # Emitted with the exception raised by the function when it fails.
+    error = Signal(object)
+
+    # Emitted once the function has finished, whether it succeeded or not.
+    finished = Signal()
+
+    # Emitted with the partial results reported by the function while it is running.
+    progress = Signal(object)
+
+
+class Worker(QRunnable):
+    """
+    Run a function on a QThreadPool thread so that network I/O does not block the GUI.
+    """
+
+    def __init__(self, fn, *args, **kwargs):
+        super(Worker, self).__init__()
+
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+
+        # The signals object is created on the GUI thread, so its signals are delivered there.
+        self.signals = WorkerSignals()
+
+    @Slot()
+    def run(self):
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+
+        except Exception as e:
+            self.signals.error.emit(e)
+
+        else:
+            self.signals.result.emit(result)
+
+        finally:
+            self.signals.finished.emit()
@@ -0,0 +1,161 @@
+import json
+import random
+import time
+from dataclasses import dataclass, field
+from api_client import CONNECTION_ERRORS, ServerError
+
+# Number of seconds to wait before retrying a write for the first time. This doubles with every failed attempt.
+BASE_RETRY_DELAY = 5
+
+# Maximum number of seconds to wait between retries of a write.
+MAX_RETRY_DELAY = 300
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pending_writes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    last_error TEXT
+);
+"""
+
+
+class WriteConflict(Exception):
+    """
+    Raised by a replay handler when the API server rejected a queued write, so retrying it would not help.
+    """
+
+
+@dataclass
+class ReplayResult:
+    """
+    Outcome of replaying the queued writes.
+    """
+
+    applied: list = field(default_factory=list)
+    conflicts: list = field(default_factory=list)
+    remaining: int = 0
+
+
+class WriteQueue:
+    """
+    Durable journal of writes made while the API server could not be reached, stored alongside the local mirror.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+        with self.store.lock, self.store.connection:
+            self.store.connection.executescript(SCHEMA)
+
+    def enqueue(self, kind, payload):
+        """
+        Record a write to be sent to the API server once it can be reached again.
+        """
+
+        with self.store.lock, self.store.connection:
+            cursor = self.store.connection.execute(
+                "INSERT INTO pending_writes (kind, payload, created_at) VALUES (?, ?, ?)",
+                (kind, json.dumps(payload), time.time()),
+            )
+
+        return cursor.lastrowid
+
+    def count(self):
+        """
+        Get the number of writes waiting to be sent.
+        """
+
+        with self.store.lock:
+            return self.store.connection.execute(
+                "SELECT COUNT(*) FROM pending_writes"
+            ).fetchone()[0]
+
+    def pending(self):
+        """
+        Get the writes waiting to be sent, in the order they were made.
+        """
+
+        with self.store.lock:
+            rows = self.store.connection.execute(
+                "SELECT * FROM pending_writes ORDER BY id"
+            ).fetchall()
+
+        return [{**dict(row), "payload": json.loads(row["payload"])} for row in rows]
+
+    def replay(self, handlers):
+        """
+        Send the queued writes in order using the handler registered for each kind of write.
+        If the API server cannot be reached or fails, the replay stops and the write is retried after a jittered
+        exponential backoff so that order is preserved. Any other failure would happen again on every retry and block
+        the writes behind it, so the write is dropped and reported as a conflict.
+        """
+
+        result = ReplayResult()
+
+        for write in self.pending():
+            # Writes must be applied in order, so nothing after a write that is still backing off can be sent.
+            if write["next_attempt_at"] > time.time():
+                break
+
+            try:
+                handlers[write["kind"]](write["payload"])
+
+            except (*CONNECTION_ERRORS, ServerError) as e:
+                self.schedule_retry(write, e)
+                break
+
+            except WriteConflict as e:
+                self.remove(write["id"])
+                result.conflicts.append((write, str(e)))
+
+            except Exception as e:
+                self.remove(write["id"])
+                result.conflicts.append(
+                    (write, f"The queued {write['kind']} failed: {e!r}")
+                )
+
+            else:
+                self.remove(write["id"])
+                result.applied.append(write)
+
+        result.remaining = self.count()
+
+        return result
+
+    def schedule_retry(self, write, error):
+        """
+        Push the next attempt of a write back with jittered exponential backoff.
+        """
+
+        attempts = write["attempts"] + 1
+        delay = min(MAX_RETRY_DELAY, BASE_RETRY_DELAY * 2 ** (attempts - 1))
+        delay *= random.uniform(0.5, 1.5)
+
+        with self.store.lock, self.store.connection:
+            self.store.connection.execute(
+                "UPDATE pending_writes SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                (attempts, time.time() + delay, str(error), write["id"]),
+            )
+
+    def update_payload(self, write_id, payload):
+        """
+        Replace the payload of a queued write. Returns False if the write is no longer queued.
+        """
+
+        with self.store.lock, self.store.connection:
+            cursor = self.store.connection.execute(
+                "UPDATE pending_writes SET payload = ? WHERE id = ?",
+                (json.dumps(payload), write_id),
+            )
+
+        return cursor.rowcount > 0
+
+    def remove(self, write_id):
+        with self.store.lock, self.store.connection:
+            self.store.connection.execute(
+                "DELETE FROM pending_writes WHERE id = ?", (write_id,)
+            )